@@ -8,16 +8,44 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
+import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from video_processor import VideoProcessor
+from video_processor import VideoProcessor, BATCH_MAX_FILES
 import queue
 import time
 
+# 日志区域最多保留的行数，超出后删除最早的若干行
+LOG_MAX_LINES = 5000
+LOG_TRIM_LINES = 500
+
+# 并发探测视频信息的最大线程数
+PROBE_WORKERS = 16
+
+# 视频信息缓存文件：按路径记录文件大小、修改时间和探测结果
+PROBE_CACHE_PATH = Path.home() / ".vfhm_probe_cache.json"
+
+# 转换规则：视频宽度 -> 目标高度
+TARGET_HEIGHT = {
+    1920: 1080,  # 1080p
+    2560: 1440,  # 2K
+    3840: 2160,  # 4K
+    5120: 2880,  # 5K
+    7680: 4320,  # 8K
+}
+
+# FFmpeg环境是否已设置成功
+_ENV_READY = False
+
 # 添加FFmpeg到临时环境变量
 def setup_ffmpeg_environment():
-    """设置FFmpeg环境变量"""
+    """设置FFmpeg环境变量（成功后重复调用直接返回）"""
+    global _ENV_READY
+    if _ENV_READY:
+        return True
+        
     # 获取程序所在目录
     if getattr(sys, 'frozen', False):
         # 如果是打包后的exe文件
@@ -29,7 +57,13 @@ def setup_ffmpeg_environment():
     # FFmpeg可执行文件路径
     ffmpeg_bin_dir = current_dir / "bin"
     
-    if ffmpeg_bin_dir.exists():
+    # 一次扫描目录获取全部文件名，代替多次exists检查
+    try:
+        entries = {entry.name.lower() for entry in os.scandir(ffmpeg_bin_dir)}
+    except (FileNotFoundError, NotADirectoryError):
+        entries = None
+    
+    if entries is not None:
         # 获取当前PATH环境变量
         current_path = os.environ.get('PATH', '')
         ffmpeg_path_str = str(ffmpeg_bin_dir)
@@ -44,11 +78,9 @@ def setup_ffmpeg_environment():
             print(f"✓ FFmpeg路径已存在于环境变量中")
         
         # 验证FFmpeg是否可用
-        ffmpeg_exe = ffmpeg_bin_dir / "ffmpeg.exe"
-        ffprobe_exe = ffmpeg_bin_dir / "ffprobe.exe"
-        
-        if ffmpeg_exe.exists() and ffprobe_exe.exists():
+        if {"ffmpeg.exe", "ffprobe.exe"} <= entries:
             print(f"✓ FFmpeg工具验证成功")
+            _ENV_READY = True
             return True
         else:
             print(f"⚠ 警告: FFmpeg工具文件不完整")
@@ -57,6 +89,35 @@ def setup_ffmpeg_environment():
         print(f"⚠ 警告: 找不到FFmpeg工具目录: {ffmpeg_bin_dir}")
         return False
 
+class NotifyingQueue(queue.SimpleQueue):
+    """放入消息后立即通知GUI线程处理的消息队列"""
+    def __init__(self, notify):
+        super().__init__()
+        self._notify = notify
+        
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        self._notify()
+
+
+class JobMessageQueue:
+    """单个转换任务的消息队列：进度带上任务编号转发，并行转换时日志加上文件名前缀"""
+    def __init__(self, message_queue, job_id, weight=1, prefix=""):
+        self._queue = message_queue
+        self._job_id = job_id
+        self._weight = weight
+        self._prefix = prefix
+        
+    def put(self, item):
+        message_type, data = item
+        if message_type == "progress_percent":
+            self._queue.put(("job_progress", (self._job_id, self._weight, data)))
+        elif message_type == "log" and self._prefix:
+            self._queue.put(("log", f"{self._prefix}{data}"))
+        else:
+            self._queue.put(item)
+
+
 class VideoResizeApp:
     def __init__(self, root):
         self.root = root
@@ -84,18 +145,45 @@ class VideoResizeApp:
         # 初始化视频处理器
         self.video_processor = VideoProcessor()
         
-        # 消息队列用于线程间通信
-        self.message_queue = queue.Queue()
+        # 可用GPU加速选项（后台线程检测，完成前为空）
+        self._gpu_options = []
+        self._gpu_detecting = True
         
-        # 当前选择的文件
-        self.selected_files = []
+        # 转换进行中不允许重新检测GPU（检测会占用编码器会话并替换正在使用的选项）
+        self._converting = False
+        
+        # 消息队列用于线程间通信，放入消息时通过虚拟事件唤醒GUI线程
+        self.message_queue = NotifyingQueue(self._notify_queue)
+        self.root.bind('<<QueueMsg>>', lambda e: self._drain_queue())
+        
+        # 当前选择的文件（有序字典去重，值未使用）
+        self.selected_files = {}
+        
+        # 视频信息缓存，文件大小或修改时间变化后自动失效
+        self._probe_cache = self._load_probe_cache()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 编码阶段异常退出时通知探测线程放弃等待（每次转换重新创建）
+        self._pipeline_cancel = threading.Event()
+        
+        # 混合进度计算：进行中任务的 (文件数, 进度百分比)、已结束文件数与文件总数
+        self._job_progress = {}
+        self._files_done = 0
+        self.total_files = 1
+        
+        # 上次写入进度控件的值，值未变化时不重复写入
+        self._last_progress = 0.0
+        self._last_progress_detail = ""
         
         # 创建界面
         self.create_widgets()
         
-        # 启动消息队列监听
+        # 启动消息队列兜底检查
         self.check_queue()
         
+        # 试编码检测GPU耗时较长，放到后台线程，避免窗口卡住
+        self._start_gpu_detection(refresh=False)
+        
     def create_widgets(self):
         """创建GUI界面"""
         # 主框架
@@ -123,7 +211,7 @@ class VideoResizeApp:
         select_btn.grid(row=0, column=0, padx=(0, 10))
         
         # 文件列表
-        self.file_listbox = tk.Listbox(file_frame, height=4)
+        self.file_listbox = tk.Listbox(file_frame, height=4, selectmode=tk.EXTENDED)
         self.file_listbox.grid(row=0, column=1, sticky="ew", padx=(0, 10))
         
         # 滚动条
@@ -137,6 +225,11 @@ class VideoResizeApp:
                               command=self.clear_files)
         clear_btn.grid(row=0, column=3)
         
+        # 移除选中文件按钮
+        remove_btn = ttk.Button(file_frame, text="移除选中", 
+                               command=self.remove_selected_files)
+        remove_btn.grid(row=0, column=4, padx=(10, 0))
+        
         # 转换设置区域
         settings_frame = ttk.LabelFrame(main_frame, text="转换设置", padding="10")
         settings_frame.grid(row=2, column=0, columnspan=3, sticky="ew", pady=(0, 10))
@@ -156,12 +249,13 @@ class VideoResizeApp:
                                     font=("Arial", 8), foreground="green")
         gpu_status_label.grid(row=0, column=1, sticky=tk.W, padx=(10, 0))
         
+        # 重新检测GPU按钮
+        self.redetect_btn = ttk.Button(settings_frame, text="重新检测",
+                                       command=self.redetect_gpu)
+        self.redetect_btn.grid(row=0, column=2, sticky=tk.W, padx=(10, 0))
+        
         # 初始化时显示GPU状态
-        gpu_options = self.video_processor.detect_gpu()
-        if gpu_options:
-            self.gpu_status_var.set(f"✓ 检测到: {', '.join(gpu_options[:2])}")
-        else:
-            self.gpu_status_var.set("⚠ 未检测到GPU")
+        self.update_gpu_status()
         
         # 覆盖原文件选项
         self.overwrite_var = tk.BooleanVar(value=False)
@@ -174,6 +268,8 @@ class VideoResizeApp:
         rules_frame.grid(row=3, column=0, columnspan=3, sticky="ew", pady=(0, 10))
         
         rules_text = """转换规则：
+• 检测到宽度为 1920 的视频 → 转换为 1920 x 1080 (1080p)
+• 检测到宽度为 2560 的视频 → 转换为 2560 x 1440 (2K)
 • 检测到宽度为 3840 的视频 → 转换为 3840 x 2160 (4K)
 • 检测到宽度为 5120 的视频 → 转换为 5120 x 2880 (5K)
 • 检测到宽度为 7680 的视频 → 转换为 7680 x 4320 (8K)
@@ -242,6 +338,37 @@ class VideoResizeApp:
                                  command=self.copy_log)
         copy_log_btn.pack(side=tk.LEFT)
         
+    def update_gpu_status(self):
+        """更新GPU状态显示"""
+        if self._gpu_detecting:
+            self.gpu_status_var.set("正在检测GPU...")
+        elif self._gpu_options:
+            self.gpu_status_var.set(f"✓ 检测到: {', '.join(self._gpu_options[:2])}")
+        else:
+            self.gpu_status_var.set("⚠ 未检测到GPU")
+            
+    def redetect_gpu(self):
+        """重新检测GPU加速选项"""
+        if self._converting:
+            return
+        self._start_gpu_detection(refresh=True)
+        
+    def _start_gpu_detection(self, refresh):
+        """在后台线程检测GPU，结果通过消息队列返回"""
+        self._gpu_detecting = True
+        self.redetect_btn.config(state="disabled")
+        self.update_gpu_status()
+        threading.Thread(target=self._gpu_detection_worker, args=(refresh,), daemon=True).start()
+        
+    def _gpu_detection_worker(self, refresh):
+        """GPU检测线程"""
+        try:
+            gpu_options = self.video_processor.detect_gpu(refresh=refresh)
+        except Exception as e:
+            print(f"GPU检测出错: {e}")
+            gpu_options = []
+        self.message_queue.put(("gpu_options", gpu_options))
+        
     def select_files(self):
         """选择视频文件"""
         filetypes = [
@@ -254,21 +381,27 @@ class VideoResizeApp:
             filetypes=filetypes
         )
         
-        if files:
-            self.selected_files.extend(files)
-            self.update_file_list()
+        # 仅追加新文件，已选择的文件不重复添加
+        for file_path in files:
+            if file_path not in self.selected_files:
+                self.selected_files[file_path] = None
+                self.file_listbox.insert(tk.END, os.path.basename(file_path))
             
     def clear_files(self):
         """清空文件列表"""
         self.selected_files.clear()
-        self.update_file_list()
-        
-    def update_file_list(self):
-        """更新文件列表显示"""
         self.file_listbox.delete(0, tk.END)
-        for file_path in self.selected_files:
-            filename = os.path.basename(file_path)
-            self.file_listbox.insert(tk.END, filename)
+        
+    def remove_selected_files(self):
+        """移除列表中选中的文件"""
+        indices = self.file_listbox.curselection()
+        if not indices:
+            return
+        file_paths = list(self.selected_files)
+        # 从后往前删除，避免列表框索引变化
+        for index in sorted(indices, reverse=True):
+            del self.selected_files[file_paths[index]]
+            self.file_listbox.delete(index)
             
     def start_conversion(self):
         """开始转换"""
@@ -276,24 +409,33 @@ class VideoResizeApp:
             messagebox.showwarning("警告", "请先选择视频文件！")
             return
             
-        # 禁用开始按钮，启用停止按钮
+        # 禁用开始与重新检测按钮，启用停止按钮
+        self._converting = True
         self.start_btn.config(state="disabled")
+        self.redetect_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
         
         # 重置进度条
-        self.progress_var.set(0)
+        self._set_progress(0, force=True)
         
         # 清空之前的日志
         self.clear_log()
         
         # 显示GPU设置状态
         gpu_enabled = self.gpu_var.get()
-        gpu_options = self.video_processor.detect_gpu()
+        gpu_options = self._gpu_options
         gpu_status = "启用" if gpu_enabled else "禁用"
-        self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] ==> GPU加速设置: {gpu_status}\n")
+        timestamp = time.strftime('%H:%M:%S')
+        self.log_text.insert(tk.END, f"[{timestamp}] ==> GPU加速设置: {gpu_status}\n")
         if gpu_enabled and gpu_options:
-            self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] ==> 可用GPU: {', '.join(gpu_options)}\n")
-        self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] ==> 开始处理 {len(self.selected_files)} 个文件\n\n")
+            self.log_text.insert(tk.END, f"[{timestamp}] ==> 可用GPU: {', '.join(gpu_options)}\n")
+        self.log_text.insert(tk.END, f"[{timestamp}] ==> 开始处理 {len(self.selected_files)} 个文件\n\n")
+        
+        # 清除上一次的停止请求与进度记录
+        self.video_processor.should_stop = False
+        self._job_progress = {}
+        self._files_done = 0
+        self.total_files = len(self.selected_files)
         
         # 在新线程中进行转换
         self.conversion_thread = threading.Thread(
@@ -309,93 +451,110 @@ class VideoResizeApp:
         self.stop_btn.config(state="disabled")
         self.status_var.set("转换已停止")
         
+    def _probe_worker(self, files, probe_queue):
+        """探测线程：并发获取全部视频信息，按原顺序交给编码阶段"""
+        try:
+            if not files:
+                return
+            with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(files))) as executor:
+                infos = executor.map(self._probe_file, files)
+                for i, (file_path, video_info) in enumerate(zip(files, infos)):
+                    if not self._put_until_stopped(probe_queue, (i, file_path, video_info)):
+                        return
+        finally:
+            # 结束标记
+            self._put_until_stopped(probe_queue, None)
+            
+    def _probe_file(self, file_path):
+        """获取单个文件的视频信息，停止转换后不再启动新的探测"""
+        if self._pipeline_stopped():
+            return None
+            
+        # 文件未变化时直接使用缓存结果
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        cached = self._probe_cache.get(file_path)
+        if cached and cached.get('size') == st.st_size and cached.get('mtime_ns') == st.st_mtime_ns:
+            return cached.get('info')
+            
+        video_info = self.video_processor.get_video_info(file_path)
+        if video_info:
+            self._probe_cache[file_path] = {
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'info': video_info
+            }
+        return video_info
+        
+    def _load_probe_cache(self):
+        """读取视频信息缓存"""
+        try:
+            with open(PROBE_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            return cache if isinstance(cache, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"读取视频信息缓存出错: {e}")
+            return {}
+            
+    def _save_probe_cache(self):
+        """保存视频信息缓存"""
+        try:
+            with open(PROBE_CACHE_PATH, 'w', encoding='utf-8') as f:
+                json.dump(dict(self._probe_cache), f, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存视频信息缓存出错: {e}")
+            
+    def on_close(self):
+        """关闭窗口：停止转换并保存缓存"""
+        self.video_processor.stop_conversion()
+        self._save_probe_cache()
+        self.root.destroy()
+        
+    def _pipeline_stopped(self):
+        """用户停止转换或编码阶段已退出时返回True"""
+        return self.video_processor.should_stop or self._pipeline_cancel.is_set()
+        
+    def _put_until_stopped(self, probe_queue, item):
+        """向有界队列放入数据，停止转换或编码阶段退出时放弃等待"""
+        while not self._pipeline_stopped():
+            try:
+                probe_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+        
+    def _next_probed(self, probe_queue):
+        """从探测队列取出下一项，停止转换或探测结束时返回None"""
+        while not self._pipeline_stopped():
+            try:
+                return probe_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+        
     def conversion_worker(self):
         """转换工作线程"""
         try:
-            total_files = len(self.selected_files)
-            for i, file_path in enumerate(self.selected_files):
-                if self.video_processor.should_stop:
-                    break
-                    
-                # 更新状态
-                filename = os.path.basename(file_path)
-                self.message_queue.put(("status", f"正在处理: {filename}"))
-                self.message_queue.put(("log", f"开始处理文件: {filename}"))
-                
-                # 获取视频信息
-                video_info = self.video_processor.get_video_info(file_path)
-                if not video_info:
-                    self.message_queue.put(("log", f"错误: 无法获取视频信息 - {filename}"))
-                    continue
-                    
-                width = video_info.get('width', 0)
-                height = video_info.get('height', 0)
-                duration = video_info.get('duration', 0)
-                
-                self.message_queue.put(("log", f"视频分辨率: {width}x{height}"))
-                if duration > 0:
-                    duration_str = f"{int(duration//3600):02d}:{int((duration%3600)//60):02d}:{int(duration%60):02d}"
-                    self.message_queue.put(("log", f"视频时长: {duration_str}"))
-                
-                # 检查是否需要转换
-                if width == 3840:
-                    target_height = 2160
-                elif width == 5120:
-                    target_height = 2880
-                elif width == 7680:
-                    target_height = 4320
-                else:
-                    self.message_queue.put(("log", f"跳过文件 (不支持的宽度): {filename}"))
-                    continue
-                    
-                # 如果高度已经正确，跳过
-                if height == target_height:
-                    self.message_queue.put(("log", f"跳过文件 (高度已正确): {filename}"))
-                    continue
-                    
-                # 生成输出文件路径
-                if self.overwrite_var.get():
-                    output_path = file_path
-                else:
-                    file_dir = os.path.dirname(file_path)
-                    file_name = os.path.splitext(os.path.basename(file_path))[0]
-                    file_ext = os.path.splitext(file_path)[1]
-                    output_path = os.path.join(file_dir, f"{file_name}_resized{file_ext}")
-                
-                # 执行转换前再次确认GPU设置
-                gpu_enabled = self.gpu_var.get()
-                gpu_status_text = "启用" if gpu_enabled else "禁用"
-                self.message_queue.put(("log", f"转换参数 - GPU加速: {gpu_status_text}"))
-                
-                if not gpu_enabled:
-                    # 如果GPU被禁用，提醒用户
-                    self.message_queue.put(("log", "⚠️ 注意: 您已禁用GPU加速，转换速度将显著放慢"))
-                    self.message_queue.put(("log", "提示: 可在转换设置中勾选'GPU加速'来提高性能"))
-                
-                self.message_queue.put(("log", f"开始转换到 {width}x{target_height}"))
-                # 重置单个文件进度条
-                self.message_queue.put(("file_progress", 0))
-                # 设置当前处理的文件索引，用于混合进度计算
-                self.message_queue.put(("current_file_info", (i, total_files)))
-                
-                success = self.video_processor.convert_video(
-                    file_path, 
-                    output_path, 
-                    width, 
-                    target_height,
-                    self.gpu_var.get(),
-                    self.message_queue
-                )
-                
-                if success:
-                    self.message_queue.put(("log", f"转换完成: {os.path.basename(output_path)}"))
-                    self.message_queue.put(("file_progress", 100))  # 单个文件完成
-                else:
-                    self.message_queue.put(("log", f"转换失败: {filename}"))
-                    
-                # 更新总进度
-                overall_progress = ((i + 1) / total_files) * 100
-                self.message_queue.put(("progress", overall_progress))
+            files = list(self.selected_files)
+            
+            # 探测与编码流水线：后台线程提前探测视频信息（有界队列），本线程产生转换任务并行编码
+            probe_queue = queue.Queue(maxsize=4)
+            self._pipeline_cancel = threading.Event()
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                probe_future = executor.submit(self._probe_worker, files, probe_queue)
+                try:
+                    self._encode_stage(probe_queue)
+                finally:
+                    # 编码阶段结束（包括出错）后探测线程不再等待队列空位，
+                    # 否则退出with时会与阻塞在已满队列上的探测线程互相等待
+                    self._pipeline_cancel.set()
+                # 探测线程出现异常时在此抛出
+                probe_future.result()
                 
             # 转换完成
             if not self.video_processor.should_stop:
@@ -410,8 +569,151 @@ class VideoResizeApp:
         finally:
             self.message_queue.put(("enable_start", None))
             
+    def _encode_stage(self, probe_queue):
+        """编码阶段：消费探测结果，需要转换的文件交给视频处理器并行转换"""
+        use_gpu = self.gpu_var.get()
+        parallel = self.video_processor.default_max_workers(use_gpu) > 1
+        jobs = self._group_jobs(self._iter_jobs(probe_queue, use_gpu, parallel), parallel)
+        self.video_processor.convert_many(jobs, use_gpu, on_done=self._on_job_done)
+        
+    def _group_jobs(self, jobs, parallel):
+        """将相邻且可合并的短视频任务组成批量任务，由一个FFmpeg进程连续转换"""
+        pending = []
+        pending_key = None
+        for job in jobs:
+            key = self.video_processor.batch_key(job['video_info'], job['output'], job['width'], job['height'])
+            if pending and (key is None or key != pending_key or len(pending) >= BATCH_MAX_FILES):
+                yield self._make_batch_job(pending, parallel)
+                pending = []
+            if key is None:
+                yield job
+            else:
+                pending.append(job)
+                pending_key = key
+        if pending:
+            yield self._make_batch_job(pending, parallel)
+            
+    def _make_batch_job(self, jobs, parallel):
+        """由多个任务构建批量任务，只有一个任务时原样返回"""
+        if len(jobs) == 1:
+            return jobs[0]
+        job_id = ("batch", jobs[0]['job_id'])
+        self.message_queue.put(("log", f"合并转换 {len(jobs)} 个参数相同的短视频"))
+        return {
+            'batch': jobs,
+            'width': jobs[0]['width'],
+            'height': jobs[0]['height'],
+            'message_queue': JobMessageQueue(self.message_queue, job_id, weight=len(jobs),
+                                             prefix=f"[批量 {len(jobs)} 个文件] " if parallel else ""),
+            'job_id': job_id,
+        }
+        
+    def _iter_jobs(self, probe_queue, use_gpu, parallel):
+        """按探测顺序产生转换任务，跳过的文件直接计入进度"""
+        gpu_status_text = "启用" if use_gpu else "禁用"
+        while True:
+            item = self._next_probed(probe_queue)
+            if item is None:
+                break
+            i, file_path, video_info = item
+            
+            # 更新状态
+            filename = os.path.basename(file_path)
+            self.message_queue.put(("status", f"正在处理: {filename}"))
+            self.message_queue.put(("log", f"开始处理文件: {filename}"))
+            
+            # 视频信息已由探测线程提前获取
+            if not video_info:
+                self.message_queue.put(("log", f"错误: 无法获取视频信息 - {filename}"))
+                self.message_queue.put(("job_done", ((), 1)))
+                continue
+                
+            width = video_info.get('width', 0)
+            height = video_info.get('height', 0)
+            duration = video_info.get('duration', 0)
+            
+            self.message_queue.put(("log", f"视频分辨率: {width}x{height}"))
+            if duration > 0:
+                duration_str = f"{int(duration//3600):02d}:{int((duration%3600)//60):02d}:{int(duration%60):02d}"
+                self.message_queue.put(("log", f"视频时长: {duration_str}"))
+            
+            # 检查是否需要转换
+            target_height = TARGET_HEIGHT.get(width)
+            if target_height is None:
+                self.message_queue.put(("log", f"跳过文件 (不支持的宽度): {filename}"))
+                self.message_queue.put(("job_done", ((), 1)))
+                continue
+                
+            # 如果高度已经正确，跳过
+            if height == target_height:
+                self.message_queue.put(("log", f"跳过文件 (高度已正确): {filename}"))
+                self.message_queue.put(("job_done", ((), 1)))
+                continue
+                
+            # 生成输出文件路径
+            if self.overwrite_var.get():
+                output_path = file_path
+            else:
+                file_dir = os.path.dirname(file_path)
+                file_name, file_ext = os.path.splitext(filename)
+                output_path = os.path.join(file_dir, f"{file_name}_resized{file_ext}")
+            
+            self.message_queue.put(("log", f"转换参数 - GPU加速: {gpu_status_text}"))
+            if not use_gpu:
+                # 如果GPU被禁用，提醒用户
+                self.message_queue.put(("log", "⚠️ 注意: 您已禁用GPU加速，转换速度将显著放慢"))
+                self.message_queue.put(("log", "提示: 可在转换设置中勾选'GPU加速'来提高性能"))
+            
+            self.message_queue.put(("log", f"开始转换到 {width}x{target_height}"))
+            
+            # 并行转换时各文件的日志交错输出，加上文件名前缀区分
+            yield {
+                'input': file_path,
+                'output': output_path,
+                'width': width,
+                'height': target_height,
+                'video_info': video_info,
+                'message_queue': JobMessageQueue(self.message_queue, i,
+                                                 prefix=f"[{filename}] " if parallel else ""),
+                'job_id': i,
+            }
+            
+    def _on_job_done(self, job, result):
+        """转换任务结束（在工作线程中调用），批量任务的result为各文件结果列表"""
+        if 'batch' in job:
+            file_jobs, results = job['batch'], result
+        else:
+            file_jobs, results = [job], [result]
+        for file_job, success in zip(file_jobs, results):
+            if success:
+                self.message_queue.put(("log", f"转换完成: {os.path.basename(file_job['output'])}"))
+            elif not self.video_processor.should_stop:
+                self.message_queue.put(("log", f"转换失败: {os.path.basename(file_job['input'])}"))
+                
+        # 批量转换失败后逐个转换时，各文件以自己的任务编号汇报过进度，一并清除
+        job_ids = (job['job_id'],) + tuple(file_job['job_id'] for file_job in job.get('batch', ()))
+        self.message_queue.put(("job_done", (job_ids, len(file_jobs))))
+        
+    def _notify_queue(self):
+        """通知GUI线程有新消息（可在工作线程中调用）"""
+        try:
+            self.root.event_generate('<<QueueMsg>>', when='tail')
+        except (tk.TclError, RuntimeError):
+            # 窗口已关闭或主循环未运行，由兜底检查处理
+            pass
+            
     def check_queue(self):
-        """检查消息队列"""
+        """兜底检查消息队列，防止遗漏通知"""
+        try:
+            self._drain_queue()
+        finally:
+            self.root.after(500, self.check_queue)
+            
+    def _drain_queue(self):
+        """处理消息队列中的全部消息"""
+        # 本轮的日志行合并后一次性插入，减少文本框重绘
+        log_lines = []
+        timestamp = time.strftime('%H:%M:%S')
         try:
             while True:
                 message_type, data = self.message_queue.get_nowait()
@@ -419,45 +721,68 @@ class VideoResizeApp:
                 if message_type == "status":
                     self.status_var.set(data)
                 elif message_type == "log":
-                    self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] {data}\n")
-                    self.log_text.see(tk.END)
-                elif message_type == "progress":
-                    # 总体进度（文件完成进度）
-                    self.progress_var.set(data)
-                elif message_type == "progress_percent":
-                    # 单个文件的进度百分比（用于更精确的进度显示）
-                    current_file_progress = data
-                    self.progress_detail_var.set(f"当前文件进度: {current_file_progress:.1f}%")
-                    
-                    # 计算混合进度：结合文件完成进度和当前文件进度
-                    if hasattr(self, 'current_file_index') and hasattr(self, 'total_files'):
-                        if self.total_files > 0:
-                            # 已完成文件的进度
-                            completed_files_progress = (self.current_file_index / self.total_files) * 100
-                            # 当前文件的进度贡献
-                            current_file_contribution = (current_file_progress / 100) * (100 / self.total_files)
-                            # 总进度
-                            total_progress = completed_files_progress + current_file_contribution
-                            self.progress_var.set(min(total_progress, 100))
-                    
-                elif message_type == "current_file_info":
-                    # 设置当前文件信息
-                    self.current_file_index, self.total_files = data
-                elif message_type == "file_progress":
-                    # 单个文件的进度
-                    if data == 0:
-                        self.progress_detail_var.set("开始转换...")
-                    elif data == 100:
-                        self.progress_detail_var.set("当前文件转换完成")
+                    log_lines.append(f"[{timestamp}] {data}\n")
+                elif message_type == "job_progress":
+                    # 进行中任务的进度百分比
+                    job_id, weight, percent = data
+                    self._job_progress[job_id] = (weight, percent)
+                    if len(self._job_progress) == 1:
+                        self._set_progress_detail(f"当前文件进度: {percent:.1f}%")
+                    else:
+                        self._set_progress_detail(f"并行转换 {len(self._job_progress)} 个文件")
+                    self._update_overall_progress()
+                elif message_type == "job_done":
+                    # 任务结束（包括跳过的文件，其任务编号为空）
+                    job_ids, weight = data
+                    for job_id in job_ids:
+                        self._job_progress.pop(job_id, None)
+                    self._files_done += weight
+                    if job_ids and not self._job_progress:
+                        self._set_progress_detail("当前文件转换完成")
+                    self._update_overall_progress()
+                elif message_type == "gpu_options":
+                    self._gpu_options = data
+                    self._gpu_detecting = False
+                    self.update_gpu_status()
+                    if not self._converting:
+                        self.redetect_btn.config(state="normal")
                 elif message_type == "enable_start":
+                    self._converting = False
                     self.start_btn.config(state="normal")
                     self.stop_btn.config(state="disabled")
+                    if not self._gpu_detecting:
+                        self.redetect_btn.config(state="normal")
                     
         except queue.Empty:
             pass
-        finally:
-            # 每100ms检查一次队列
-            self.root.after(100, self.check_queue)
+            
+        if log_lines:
+            self.log_text.insert(tk.END, ''.join(log_lines))
+            # 限制日志行数，避免文本框过大导致卡顿
+            line_count = int(self.log_text.index('end-1c').split('.')[0])
+            if line_count > LOG_MAX_LINES:
+                self.log_text.delete('1.0', f'{LOG_TRIM_LINES + 1}.0')
+            self.log_text.see(tk.END)
+            
+    def _update_overall_progress(self):
+        """计算混合进度：(已结束文件数 + 进行中任务完成比例) / 文件总数"""
+        # 注意：这里只有少量进度运算，无需Numba；若将来在Python中做逐帧像素处理，
+        # 须使用 @numba.njit（Python逐帧循环约慢50倍），而不要对FFmpeg调用加 @njit
+        running = sum(weight * percent for weight, percent in self._job_progress.values()) * 0.01
+        total = self.total_files or 1
+        self._set_progress(min((self._files_done + running) / total * 100.0, 100))
+        
+    def _set_progress(self, value, force=False):
+        """更新进度条，变化小于0.1%时跳过以减少重绘"""
+        if force or abs(value - self._last_progress) >= 0.1:
+            self.progress_var.set(value)
+            self._last_progress = value
+            
+    def _set_progress_detail(self, text):
+        """更新进度详情，文本未变化时跳过"""
+        if text != self._last_progress_detail:
+            self.progress_detail_var.set(text)
+            self._last_progress_detail = text
             
     def clear_log(self):
         """清空日志"""
@@ -3,13 +3,228 @@
 """
 视频处理器模块
 负责FFmpeg调用和GPU加速视频转换
+
+逐帧处理全部由FFmpeg子进程完成。若将来在Python侧加入逐帧像素运算（如水印、叠加），
+必须使用 @numba.njit 编译；FFmpeg子进程调度本身不受益于Numba。
 """
 
+import bisect
+import functools
 import os
+import queue
+import shutil
 import subprocess
 import json
-import re
-import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 可选：orjson解析更快，未安装时使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 源视频编码 -> NVDEC (cuvid) 硬件解码器
+CUVID_DECODERS = {
+    'h264': 'h264_cuvid',
+    'hevc': 'hevc_cuvid',
+    'av1': 'av1_cuvid',
+    'vp8': 'vp8_cuvid',
+    'vp9': 'vp9_cuvid',
+    'mpeg1video': 'mpeg1_cuvid',
+    'mpeg2video': 'mpeg2_cuvid',
+    'mpeg4': 'mpeg4_cuvid',
+    'vc1': 'vc1_cuvid',
+    'mjpeg': 'mjpeg_cuvid',
+}
+
+# 源视频编码 -> QSV 硬件解码器（-hwaccel qsv 本身不启用解码，必须显式指定解码器）
+QSV_DECODERS = {
+    'h264': 'h264_qsv',
+    'hevc': 'hevc_qsv',
+    'av1': 'av1_qsv',
+    'vp8': 'vp8_qsv',
+    'vp9': 'vp9_qsv',
+    'mpeg2video': 'mpeg2_qsv',
+    'vc1': 'vc1_qsv',
+    'mjpeg': 'mjpeg_qsv',
+}
+
+# -progress 输出中用到的字段（字节串，直接与管道数据比较），其余字段直接丢弃
+_PROGRESS_KEYS = frozenset((b'out_time_us', b'frame', b'fps', b'bitrate'))
+
+# 同时进行的NVENC编码会话上限（消费级显卡驱动限制会话数）
+NVENC_MAX_SESSIONS = 2
+
+# 高分辨率阈值：宽度达到5K及以上时使用更保守的编码参数
+HIGH_RES_WIDTH = 5120
+
+# 预先构建的编码参数：(编码器, 是否高分辨率) -> 参数
+# NVENC参数依赖预设检测结果，由 VideoProcessor._nvenc_args 生成
+_ENCODER_ARGS = {
+    ("h264_amf", False): ("-c:v", "h264_amf", "-quality", "quality", "-rc", "vbr", "-b:v", "8M"),
+    ("h264_amf", True): (
+        "-c:v", "h264_amf",
+        "-quality", "balanced",  # 使用balanced而不是quality
+        "-rc", "vbr",
+        "-b:v", "12M",  # 降低码率
+        "-maxrate", "18M",
+        "-usage", "transcoding"  # 转码模式
+    ),
+    ("h264_qsv", False): ("-c:v", "h264_qsv", "-preset", "medium", "-b:v", "8M"),
+    ("h264_qsv", True): (
+        "-c:v", "h264_qsv",
+        "-preset", "medium",  # 使用medium而不是slower
+        "-profile:v", "main", # 使用main而不是high
+        "-b:v", "12M",       # 降低码率
+        "-maxrate", "18M",
+        "-bufsize", "24M"
+    ),
+    ("libx264", False): ("-c:v", "libx264", "-preset", "fast", "-crf", "26"),
+    ("libx264", True): ("-c:v", "libx264", "-preset", "ultrafast", "-crf", "28"),  # 最快速度，降低质量
+    # HEVC同等画质约需H.264一半的码率
+    ("hevc_amf", False): ("-c:v", "hevc_amf", "-quality", "quality", "-rc", "vbr_peak", "-b:v", "4M", "-maxrate", "8M"),
+    ("hevc_amf", True): (
+        "-c:v", "hevc_amf",
+        "-quality", "balanced",
+        "-rc", "vbr_peak",
+        "-b:v", "6M",
+        "-maxrate", "9M",
+        "-usage", "transcoding"
+    ),
+    ("hevc_qsv", False): ("-c:v", "hevc_qsv", "-preset", "medium", "-b:v", "4M"),
+    ("hevc_qsv", True): (
+        "-c:v", "hevc_qsv",
+        "-preset", "medium",
+        "-profile:v", "main",
+        "-b:v", "6M",
+        "-maxrate", "9M",
+        "-bufsize", "12M"
+    ),
+}
+
+# 需要检测的硬件编码器 -> GPU选项名称
+_HW_ENCODER_OPTIONS = {
+    "h264_nvenc": "nvenc",
+    "hevc_nvenc": "nvenc_hevc",
+    "av1_nvenc": "nvenc_av1",
+    "h264_amf": "amf",
+    "hevc_amf": "amf_hevc",
+    "h264_qsv": "qsv",
+    "hevc_qsv": "qsv_hevc",
+}
+
+# 输出宽度达到4K及以上时，优先使用同一GPU的HEVC编码器：GPU类型 -> (HEVC选项, 编码器)
+HEVC_MIN_WIDTH = 3840
+_HEVC_ENCODERS = {
+    "nvenc": ("nvenc_hevc", "hevc_nvenc"),
+    "amf": ("amf_hevc", "hevc_amf"),
+    "qsv": ("qsv_hevc", "hevc_qsv"),
+}
+
+# AV1编码器（RTX 40系列及更新显卡）：GPU类型 -> (AV1选项, 编码器)，输出为MKV/WebM时优先使用
+_AV1_ENCODERS = {
+    "nvenc": ("nvenc_av1", "av1_nvenc"),
+}
+AV1_CONTAINERS = {'.mkv', '.webm'}
+
+# 可写入HEVC的输出容器，其中MP4/MOV需要hvc1标签才能在Apple设备上播放
+HEVC_CONTAINERS = {'.mp4', '.m4v', '.mov', '.mkv'}
+_HVC1_CONTAINERS = {'.mp4', '.m4v', '.mov'}
+
+# GPU编码器尝试顺序：(GPU类型, 编码器, 名称)
+_GPU_ENCODERS = (
+    ("nvenc", "h264_nvenc", "NVIDIA NVENC"),
+    ("amf", "h264_amf", "AMD AMF"),
+    ("qsv", "h264_qsv", "Intel QuickSync"),
+)
+
+# CPU分段并行编码：单个libx264进程的帧级线程约在8个时饱和，
+# 时长达到阈值的高分辨率视频按关键帧切分为多段同时编码
+SEGMENT_MIN_DURATION = 600
+SEGMENT_THREADS = 8
+SEGMENT_MAX_SHARDS = 8
+
+# 合并转换：时长不超过阈值的短视频才合并为一个FFmpeg进程（编码器初始化开销占比高），
+# 每批文件数有上限，避免单个进程处理过久
+BATCH_MAX_DURATION = 120
+BATCH_MAX_FILES = 16
+
+# 强制关键帧输出为IDR帧的参数（segment分段器只在IDR处切分）；未列出的编码器不合并转换
+_FORCED_IDR_ARGS = {
+    "libx264": ("-forced-idr", "1"),
+    "h264_nvenc": ("-forced-idr", "1"),
+    "hevc_nvenc": ("-forced-idr", "1"),
+    "av1_nvenc": ("-forced-idr", "1"),
+    "h264_qsv": ("-forced_idr", "1"),
+    "hevc_qsv": ("-forced_idr", "1"),
+}
+
+# 高分辨率附加参数（对所有编码器）
+_HIGH_RES_ARGS = ("-thread_type", "frame")  # 帧级多线程
+
+# 输出容器可直接复制的音频编码（未列出的容器保持直接复制）
+_MP4_AUDIO_COPY = {'aac', 'mp3', 'mp2', 'ac3', 'eac3', 'alac', 'opus', 'flac'}
+CONTAINER_AUDIO_COPY = {
+    '.mp4': _MP4_AUDIO_COPY,
+    '.m4v': _MP4_AUDIO_COPY,
+    '.mov': _MP4_AUDIO_COPY | {'pcm_s16le', 'pcm_s24le', 'pcm_f32le'},
+    '.webm': {'opus', 'vorbis'},
+}
+
+# 音频无法直接复制时的转码参数（未列出的容器转为AAC）
+_AUDIO_TRANSCODE = {
+    '.webm': ("Opus", ("-c:a", "libopus", "-b:a", "160k")),
+}
+_AAC_TRANSCODE = ("AAC", ("-c:a", "aac", "-b:a", "192k"))
+
+# 输出容器可直接复制的字幕编码（None表示全部支持，未列出的容器不保留字幕）
+CONTAINER_SUBTITLE_COPY = {
+    '.mkv': None,
+    '.mp4': {'mov_text'},
+    '.m4v': {'mov_text'},
+    '.mov': {'mov_text'},
+    '.webm': {'webvtt'},
+}
+
+
+@functools.lru_cache(maxsize=64)
+def check_gpu_resolution_support(width, height, gpu_type):
+    """检测GPU是否支持指定分辨率，返回 (是否支持, 说明)"""
+    # 放宽分辨率限制，现代GPU通常支持更高分辨率
+    
+    # NVIDIA NVENC分辨率限制（基于实际测试结果）
+    if gpu_type == "nvenc":
+        # 基于测试：5K及以上分辨率NVENC不稳定
+        max_width = 4096   # 限制在4K+
+        max_height = 2304  # 略高于4K
+        if width > max_width or height > max_height:
+            return False, f"NVENC在高分辨率下不稳定 {width}x{height}（建议限制: {max_width}x{max_height}）"
+            
+    # NVIDIA HEVC/AV1 NVENC硬件上限为8K
+    elif gpu_type in ("nvenc_hevc", "nvenc_av1"):
+        max_width = 8192
+        max_height = 8192
+        if width > max_width or height > max_height:
+            return False, f"HEVC/AV1 NVENC不支持 {width}x{height} 分辨率（限制: {max_width}x{max_height}）"
+            
+    # AMD AMF分辨率限制
+    elif gpu_type in ("amf", "amf_hevc"):
+        max_width = 7680   # 支持到8K
+        max_height = 4320  # 8K高度
+        if width > max_width or height > max_height:
+            return False, f"AMD AMF可能不支持 {width}x{height} 分辨率（限制: {max_width}x{max_height}）"
+            
+    # Intel QuickSync分辨率限制
+    elif gpu_type in ("qsv", "qsv_hevc"):
+        max_width = 7680   # 支持到8K
+        max_height = 4320  # 8K高度
+        if width > max_width or height > max_height:
+            return False, f"Intel QSV可能不支持 {width}x{height} 分辨率（限制: {max_width}x{max_height}）"
+            
+    return True, ""
 
 
 class VideoProcessor:
@@ -19,14 +234,63 @@ class VideoProcessor:
         self.ffmpeg_path = os.path.join(base_dir, "bin", "ffmpeg.exe")
         self.ffprobe_path = os.path.join(base_dir, "bin", "ffprobe.exe")
         
-        # 停止标志
-        self.should_stop = False
+        # 停止标志（多个工作线程共享）
+        self._stop_event = threading.Event()
+        
+        # 正在运行的FFmpeg进程（批量转换时可能有多个）
+        self._processes = set()
+        self._processes_lock = threading.Lock()
         
-        # 当前进程
-        self.current_process = None
+        # GPU加速选项缓存（首次检测后复用），检测期间其他线程等待同一结果
+        self._gpu_options = None
+        self._gpu_lock = threading.Lock()
+        
+        # 视频信息缓存：路径 -> (文件大小, 修改时间, 视频信息)
+        self._video_info_cache = {}
+        
+        # FFmpeg滤镜列表与CUDA解码/缩放能力（首次使用时检测）
+        self._ffmpeg_filters = None
+        self._ffmpeg_decoders = None
+        self._cuda_support = None
+        
+        # NVDEC是否支持AV1解码（首次使用时检测）
+        self._nvdec_av1 = None
+        
+        # NVENC是否支持p1-p7新预设（检测到NVENC时检测）
+        self._nvenc_new_presets = None
+        
+        # 已构建的CUDA流水线参数，按 (源编码, 宽, 高) 缓存
+        self._cuda_pipeline_cache = {}
+        
+    @property
+    def should_stop(self):
+        """是否已请求停止"""
+        return self._stop_event.is_set()
+        
+    @should_stop.setter
+    def should_stop(self, value):
+        if value:
+            self._stop_event.set()
+        else:
+            self._stop_event.clear()
         
     def get_video_info(self, video_path):
-        """获取视频信息"""
+        """获取视频信息（文件未变化时返回缓存结果）"""
+        try:
+            st = os.stat(video_path)
+            cached = self._video_info_cache.get(video_path)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                return cached[2]
+        except OSError:
+            st = None
+            
+        video_info = self._probe_video_info(video_path)
+        if video_info and st:
+            self._video_info_cache[video_path] = (st.st_size, st.st_mtime_ns, video_info)
+        return video_info
+        
+    def _probe_video_info(self, video_path):
+        """调用ffprobe获取视频信息"""
         result = None
         try:
             # 使用引号包裹路径避免特殊字符问题
@@ -34,25 +298,24 @@ class VideoProcessor:
                 self.ffprobe_path,
                 "-v", "quiet",
                 "-print_format", "json",
-                "-show_format",
-                "-show_streams",
+                # 只输出用到的字段，减少输出量和解析开销
+                "-show_entries",
+                "stream=codec_type,codec_name,profile,pix_fmt,width,height,r_frame_rate,"
+                "sample_rate,channels,channel_layout:format=duration,bit_rate",
                 video_path
             ]
             
-            # 使用shell=False并添加超时控制
+            # 使用shell=False并添加超时控制，输出按字节读取直接交给JSON解析
             result = subprocess.run(
                 cmd, 
                 capture_output=True, 
-                text=True,
                 creationflags=subprocess.CREATE_NO_WINDOW,
-                timeout=60,  # 60秒超时
-                encoding='utf-8',
-                errors='replace'
+                timeout=60  # 60秒超时
             )
             
             if result.returncode != 0:
                 # 打印错误信息用于调试
-                error_msg = result.stderr.strip() if result.stderr else '未知错误'
+                error_msg = result.stderr.decode('utf-8', 'replace').strip() if result.stderr else '未知错误'
                 print(f"FFprobe错误 (exit code {result.returncode}): {error_msg}")
                 print(f"文件路径: {video_path}")
                 return None
@@ -61,11 +324,12 @@ class VideoProcessor:
                 print(f"FFprobe返回了空结果: {video_path}")
                 return None
                 
-            data = json.loads(result.stdout)
+            data = orjson.loads(result.stdout) if orjson else json.loads(result.stdout)
             
             # 查找视频流
+            streams = data.get('streams', [])
             video_stream = None
-            for stream in data.get('streams', []):
+            for stream in streams:
                 if stream.get('codec_type') == 'video':
                     video_stream = stream
                     break
@@ -87,7 +351,16 @@ class VideoProcessor:
                 'duration': float(data.get('format', {}).get('duration', 0)),
                 'bitrate': int(data.get('format', {}).get('bit_rate', 0)) if data.get('format', {}).get('bit_rate') else 0,
                 'codec': video_stream.get('codec_name', ''),
-                'fps': self._parse_fps(video_stream.get('r_frame_rate', ''))
+                'profile': video_stream.get('profile', ''),
+                'pix_fmt': video_stream.get('pix_fmt', ''),
+                'fps': self._parse_fps(video_stream.get('r_frame_rate', '')),
+                'audio_codecs': [st.get('codec_name', '') for st in streams
+                                 if st.get('codec_type') == 'audio'],
+                # 各音频流的 [采样率, 声道数, 声道布局]
+                'audio_formats': [[st.get('sample_rate', ''), st.get('channels', 0), st.get('channel_layout', '')]
+                                  for st in streams if st.get('codec_type') == 'audio'],
+                'subtitle_codecs': [st.get('codec_name', '') for st in streams
+                                    if st.get('codec_type') == 'subtitle']
             }
             
         except subprocess.TimeoutExpired:
@@ -96,7 +369,7 @@ class VideoProcessor:
         except json.JSONDecodeError as e:
             print(f"JSON解析错误: {e}")
             if result and result.stdout:
-                print(f"FFprobe输出: {result.stdout[:200]}")
+                print(f"FFprobe输出: {result.stdout[:200].decode('utf-8', 'replace')}")
             return None
         except Exception as e:
             print(f"获取视频信息出错: {e}")
@@ -114,306 +387,906 @@ class VideoProcessor:
         except:
             return 30.0  # 默认帧率
             
-    def detect_gpu(self):
-        """检测可用的GPU加速选项"""
-        gpu_options = []
+    def detect_gpu(self, refresh=False):
+        """检测可用的GPU加速选项（结果缓存，refresh为True时重新检测）
         
-        # 检测NVIDIA GPU (NVENC)
+        需要试编码，耗时可达数秒，GUI中应在后台线程调用。
+        """
+        with self._gpu_lock:
+            if self._gpu_options is not None and not refresh:
+                return list(self._gpu_options)
+            return self._detect_gpu_options()
+            
+    def _detect_gpu_options(self):
+        """试编码检测GPU加速选项并更新缓存"""
+        # 并行试编码一帧，确认编码器在当前驱动/硬件上真正可用
+        # （仅查看 -encoders 列表会把编译进FFmpeg但无对应硬件的编码器误判为可用）
         try:
-            cmd = [self.ffmpeg_path, "-hide_banner", "-encoders"]
-            result = subprocess.run(cmd, capture_output=True, text=True,
+            with ThreadPoolExecutor(max_workers=len(_HW_ENCODER_OPTIONS)) as executor:
+                available = dict(zip(_HW_ENCODER_OPTIONS,
+                                     executor.map(self._probe_encoder, _HW_ENCODER_OPTIONS)))
+        except Exception as e:
+            print(f"GPU检测出错: {e}")
+            available = {}
+            
+        gpu_options = [option for encoder, option in _HW_ENCODER_OPTIONS.items()
+                       if available.get(encoder)]
+        
+        # 检测NVENC是否支持p1-p7新预设
+        if "nvenc" in gpu_options and self._nvenc_new_presets is None:
+            self._nvenc_new_presets = self._detect_nvenc_new_presets()
+            
+        self._gpu_options = gpu_options
+        return list(gpu_options)
+        
+    def _get_ffmpeg_filters(self):
+        """获取FFmpeg支持的滤镜名称（结果缓存）"""
+        if self._ffmpeg_filters is not None:
+            return self._ffmpeg_filters
+            
+        filter_names = set()
+        try:
+            result = subprocess.run([self.ffmpeg_path, "-hide_banner", "-filters"],
+                                  capture_output=True, text=True,
                                   creationflags=subprocess.CREATE_NO_WINDOW,
                                   timeout=10)
+            filter_names = {line.split()[1] for line in result.stdout.splitlines()
+                            if len(line.split()) > 2}
+        except Exception as e:
+            print(f"滤镜检测出错: {e}")
             
-            encoders_output = result.stdout
+        self._ffmpeg_filters = filter_names
+        return self._ffmpeg_filters
+        
+    def _pick_encoder(self, target_width, target_height, gpu_options, message_queue=None,
+                      allow_hevc=False, allow_av1=False):
+        """按优先级选择支持目标分辨率的GPU编码器，都不可用时返回libx264
+        
+        allow_av1为True时优先使用同一GPU的AV1编码器；allow_hevc为True且目标宽度达到4K时，
+        其次使用HEVC编码器。
+        """
+        for gpu_type, encoder, name in _GPU_ENCODERS:
+            if gpu_type not in gpu_options:
+                continue
+            preferred = []
+            if allow_av1 and gpu_type in _AV1_ENCODERS:
+                preferred.append(("AV1",) + _AV1_ENCODERS[gpu_type])
+            if allow_hevc and target_width >= HEVC_MIN_WIDTH:
+                preferred.append(("HEVC",) + _HEVC_ENCODERS[gpu_type])
+            for codec_name, option, codec_encoder in preferred:
+                if option not in gpu_options:
+                    continue
+                supported, _ = self._check_gpu_resolution_support(target_width, target_height, option)
+                if supported:
+                    if message_queue:
+                        message_queue.put(("log", f"GPU加速: 使用 {name} ({codec_name})"))
+                    return codec_encoder
+            supported, msg = self._check_gpu_resolution_support(target_width, target_height, gpu_type)
+            if supported:
+                if message_queue:
+                    message_queue.put(("log", f"GPU加速: 使用 {name}"))
+                return encoder
+            if message_queue:
+                message_queue.put(("log", f"{name}限制: {msg}"))
+        return "libx264"
+        
+    def _encoder_args(self, encoder, is_high_res):
+        """获取编码器参数"""
+        if encoder == "h264_nvenc":
+            return self._nvenc_args(is_high_res=is_high_res)
+        if encoder == "hevc_nvenc":
+            return self._hevc_nvenc_args(is_high_res=is_high_res)
+        if encoder == "av1_nvenc":
+            return self._av1_nvenc_args(is_high_res=is_high_res)
+        return list(_ENCODER_ARGS[(encoder, is_high_res)])
+        
+    def _probe_encoder(self, encoder):
+        """用编码器编码一帧测试画面，成功则说明编码器可用"""
+        try:
+            cmd = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error",
+                   "-f", "lavfi", "-i", "color=black:s=256x256:d=0.1",
+                   "-frames:v", "1", "-c:v", encoder, "-f", "null", "-"]
+            result = subprocess.run(cmd, capture_output=True,
+                                  creationflags=subprocess.CREATE_NO_WINDOW,
+                                  timeout=10)
+            return result.returncode == 0
+        except Exception as e:
+            print(f"编码器 {encoder} 检测出错: {e}")
+            return False
             
-            # 检测各种GPU编码器
-            if "h264_nvenc" in encoders_output:
-                gpu_options.append("nvenc")
-                # 检测是否支持高分辨率
-                if "hevc_nvenc" in encoders_output:  # HEVC通常支持更高分辨率
-                    gpu_options.append("nvenc_hevc")
-                    
-            if "h264_amf" in encoders_output:  # AMD GPU
-                gpu_options.append("amf")
-                
-            if "h264_qsv" in encoders_output:  # Intel QuickSync
-                gpu_options.append("qsv")
+    def _detect_nvenc_new_presets(self):
+        """检测h264_nvenc是否支持p1-p7预设（旧版FFmpeg只接受fast/medium等名称）"""
+        try:
+            result = subprocess.run([self.ffmpeg_path, "-hide_banner", "-h", "encoder=h264_nvenc"],
+                                  capture_output=True, text=True,
+                                  creationflags=subprocess.CREATE_NO_WINDOW,
+                                  timeout=10)
+            return any(line.split()[0] == "p4" for line in result.stdout.splitlines()
+                       if line.strip())
+        except Exception as e:
+            print(f"NVENC预设检测出错: {e}")
+            return True
+            
+    def _nvenc_preset_args(self, speed, is_high_res, cq=23, preset="p4", temporal_aq=True):
+        """NVENC预设与码率控制参数（h264/hevc/av1通用）"""
+        if self._nvenc_new_presets is False:
+            args = ["-preset", "fast" if speed == "fast" else "medium"]
+        else:
+            args = ["-preset", "p2" if speed == "fast" else preset, "-tune", "hq"]
+            
+        # 恒定质量VBR，空间自适应量化
+        args.extend(["-rc", "vbr", "-cq", str(cq), "-b:v", "0", "-spatial-aq", "1", "-aq-strength", "8"])
+        
+        # 高分辨率下不使用前瞻、时间AQ和多遍编码，降低显存占用
+        if not is_high_res:
+            args.extend(["-rc-lookahead", "20"])
+            if temporal_aq:
+                args.extend(["-temporal-aq", "1"])
+        if self._nvenc_new_presets is not False:
+            args.extend(["-multipass", "disabled" if is_high_res else "qres"])
+            
+        # 加深编码队列；高分辨率每个表面占用显存大，减少数量
+        args.extend(["-surfaces", "8" if is_high_res else "32"])
+        return args
+        
+    def _nvenc_args(self, speed="quality", is_high_res=False):
+        """h264_nvenc编码参数，speed为"fast"时使用更快的预设"""
+        return ["-c:v", "h264_nvenc", "-bf", "3"] + self._nvenc_preset_args(speed, is_high_res)
+        
+    def _hevc_nvenc_args(self, speed="quality", is_high_res=False):
+        """hevc_nvenc编码参数，speed为"fast"时使用更快的预设"""
+        # Turing之前的GPU的HEVC编码器不支持时间AQ，启用会导致编码器初始化失败
+        return (["-c:v", "hevc_nvenc", "-tier", "high", "-profile:v", "main"]
+                + self._nvenc_preset_args(speed, is_high_res, cq=26, temporal_aq=False))
                 
+    def _av1_nvenc_args(self, speed="quality", is_high_res=False):
+        """av1_nvenc编码参数，speed为"fast"时使用更快的预设"""
+        return (["-c:v", "av1_nvenc", "-tile-columns", "2", "-tile-rows", "2"]
+                + self._nvenc_preset_args(speed, is_high_res, cq=28, preset="p5"))
+        
+    def _get_ffmpeg_decoders(self):
+        """获取FFmpeg支持的解码器名称（结果缓存）"""
+        if self._ffmpeg_decoders is not None:
+            return self._ffmpeg_decoders
+            
+        decoder_names = set()
+        try:
+            result = subprocess.run([self.ffmpeg_path, "-hide_banner", "-decoders"],
+                                  capture_output=True, text=True,
+                                  creationflags=subprocess.CREATE_NO_WINDOW,
+                                  timeout=10)
+            decoder_names = {line.split()[1] for line in result.stdout.splitlines()
+                             if len(line.split()) > 1}
         except Exception as e:
-            print(f"GPU检测出错: {e}")
+            print(f"获取解码器列表出错: {e}")
             
-        return gpu_options
+        self._ffmpeg_decoders = decoder_names
+        return self._ffmpeg_decoders
         
-    def _check_gpu_resolution_support(self, width, height, gpu_type):
-        """检测GPU是否支持指定分辨率"""
-        # 放宽分辨率限制，现代GPU通常支持更高分辨率
-        
-        # NVIDIA NVENC分辨率限制（基于实际测试结果）
-        if gpu_type == "nvenc":
-            # 基于测试：5K及以上分辨率NVENC不稳定
-            max_width = 4096   # 限制在4K+
-            max_height = 2304  # 略高于4K
-            if width > max_width or height > max_height:
-                return False, f"NVENC在高分辨率下不稳定 {width}x{height}（建议限制: {max_width}x{max_height}）"
+    def _detect_cuda_support(self):
+        """检测FFmpeg可用的CUDA缩放滤镜和cuvid解码器（结果缓存）"""
+        if self._cuda_support is not None:
+            return self._cuda_support
+            
+        # 优先使用scale_cuda，不可用时回退到scale_npp
+        filter_names = self._get_ffmpeg_filters()
+        scale_filter = None
+        for name in ("scale_cuda", "scale_npp"):
+            if name in filter_names:
+                scale_filter = name
+                break
                 
-        # AMD AMF分辨率限制
-        elif gpu_type == "amf":
-            max_width = 7680   # 支持到8K
-            max_height = 4320  # 8K高度
-            if width > max_width or height > max_height:
-                return False, f"AMD AMF可能不支持 {width}x{height} 分辨率（限制: {max_width}x{max_height}）"
+        cuvid_decoders = {name for name in self._get_ffmpeg_decoders() if name.endswith("_cuvid")}
+            
+        self._cuda_support = (scale_filter, cuvid_decoders)
+        return self._cuda_support
+        
+    def _detect_nvdec_av1(self):
+        """检测NVDEC是否支持AV1解码（Ampere及更新架构，计算能力8.0+）"""
+        if self._nvdec_av1 is not None:
+            return self._nvdec_av1
+            
+        supported = False
+        try:
+            result = subprocess.run(["nvidia-smi", "--query-gpu=compute_cap",
+                                     "--format=csv,noheader"],
+                                  capture_output=True, text=True,
+                                  creationflags=subprocess.CREATE_NO_WINDOW,
+                                  timeout=10)
+            caps = [float(line) for line in result.stdout.split() if line.replace('.', '', 1).isdigit()]
+            supported = bool(caps) and caps[0] >= 8.0
+        except Exception as e:
+            print(f"NVDEC AV1检测出错: {e}")
+            
+        self._nvdec_av1 = supported
+        return self._nvdec_av1
+        
+    def _build_cuda_pipeline(self, video_info, target_width, target_height):
+        """构建NVDEC解码 + CUDA缩放参数，返回 (输入前参数, 视频滤镜, 流水线说明)"""
+        codec = video_info.get('codec', '') if video_info else ''
+        key = (codec, target_width, target_height)
+        if key not in self._cuda_pipeline_cache:
+            self._cuda_pipeline_cache[key] = self._make_cuda_pipeline(codec, target_width, target_height)
+        return self._cuda_pipeline_cache[key]
+        
+    def _make_cuda_pipeline(self, codec, target_width, target_height):
+        """构建NVDEC解码 + CUDA缩放参数"""
+        scale_filter, cuvid_decoders = self._detect_cuda_support()
+        
+        # 旧GPU的NVDEC不支持AV1：CPU解码，上传到GPU缩放后直接交给NVENC
+        if codec == 'av1' and not self._detect_nvdec_av1():
+            if not scale_filter:
+                return (), None, None
+            return ((), f"format=yuv420p,hwupload_cuda,{scale_filter}={target_width}:{target_height}:format=nv12:interp_algo=lanczos",
+                    f"CPU解码(NVDEC不支持AV1) + {scale_filter} 缩放")
+            
+        if not scale_filter:
+            # 无GPU缩放滤镜：仅用GPU解码，帧回传到内存后由CPU缩放
+            return ("-hwaccel", "cuda"), None, "NVDEC解码 + CPU缩放"
+            
+        hwaccel_args = [
+            "-hwaccel", "cuda",
+            "-hwaccel_output_format", "cuda",  # 解码后的帧保留在显存中
+            "-extra_hw_frames", "8"            # 额外帧缓冲，保持NVENC队列充满
+        ]
+        # 没有对应cuvid解码器的编码仍可通过通用 -hwaccel cuda 在GPU上解码
+        decoder = CUVID_DECODERS.get(codec)
+        if decoder in cuvid_decoders:
+            hwaccel_args.extend(["-c:v", decoder])
+            
+        # h264_nvenc仅支持8位输入（hevc_nvenc使用main档次，av1_nvenc同样输入8位），统一输出nv12
+        return (tuple(hwaccel_args), f"{scale_filter}={target_width}:{target_height}:format=nv12:interp_algo=lanczos",
+                f"NVDEC解码 + {scale_filter} 缩放")
+        
+    def _build_cuda_scale_filter(self, target_width, target_height):
+        """构建上传到GPU缩放后再下载回内存的滤镜，供非NVENC编码器使用"""
+        scale_filter, _ = self._detect_cuda_support()
+        if not scale_filter:
+            return None
+        return (f"format=yuv420p,hwupload_cuda,"
+                f"{scale_filter}={target_width}:{target_height}:format=nv12:interp_algo=lanczos,"
+                f"hwdownload,format=nv12")
+        
+    def _software_scale_filter(self, target_width, target_height):
+        """CPU缩放滤镜：优先使用SIMD优化的zscale，不可用时使用scale"""
+        if "zscale" in self._get_ffmpeg_filters():
+            return f"zscale=w={target_width}:h={target_height}:f=lanczos"
+        return f"scale={target_width}:{target_height}:flags=lanczos"  # 使用高质量缩放算法
+        
+    def _build_stream_args(self, video_info, output_path, message_queue=None, source_input=0):
+        """构建音频/字幕流参数：能直接复制的流不重新编码
+        
+        source_input为音频/字幕/元数据所在的输入序号（分段编码合并时取自原文件）。
+        """
+        ext = os.path.splitext(output_path)[1].lower()
+        audio_codecs = video_info.get('audio_codecs', []) if video_info else []
+        subtitle_codecs = video_info.get('subtitle_codecs', []) if video_info else []
+        
+        # 只映射主视频流，避免封面图等附加视频流被缩放重编码
+        args = ["-map", "0:v:0", "-map", f"{source_input}:a?", "-map_metadata", str(source_input)]
+        
+        # 音频：容器支持时直接复制，否则转为容器支持的编码（WebM为Opus，其余为AAC）
+        allowed_audio = CONTAINER_AUDIO_COPY.get(ext)
+        if allowed_audio is None or all(codec in allowed_audio for codec in audio_codecs):
+            args.extend(["-c:a", "copy"])
+        else:
+            codec_name, transcode_args = _AUDIO_TRANSCODE.get(ext, _AAC_TRANSCODE)
+            args.extend(transcode_args)
+            if message_queue:
+                message_queue.put(("log", f"音频编码 {', '.join(audio_codecs)} 无法直接写入{ext}，转为{codec_name}"))
                 
-        # Intel QuickSync分辨率限制
-        elif gpu_type == "qsv":
-            max_width = 7680   # 支持到8K
-            max_height = 4320  # 8K高度
-            if width > max_width or height > max_height:
-                return False, f"Intel QSV可能不支持 {width}x{height} 分辨率（限制: {max_width}x{max_height}）"
+        # 字幕：仅在容器支持时保留并直接复制
+        if subtitle_codecs and ext in CONTAINER_SUBTITLE_COPY:
+            allowed_subtitle = CONTAINER_SUBTITLE_COPY[ext]
+            if allowed_subtitle is None or all(codec in allowed_subtitle for codec in subtitle_codecs):
+                args.extend(["-map", f"{source_input}:s?", "-c:s", "copy"])
                 
-        return True, ""
+        return args
+        
+    def _build_mux_args(self, output_path, faststart_no_rewrite=True):
+        """构建MP4/MOV封装参数"""
+        if os.path.splitext(output_path)[1].lower() not in ('.mp4', '.m4v', '.mov'):
+            return []
+        if faststart_no_rewrite:
+            # 分片MP4：moov在文件开头，编码结束后无需再完整读写一遍文件
+            return ["-movflags", "+frag_keyframe+empty_moov+default_base_moof", "-write_tmcd", "0"]
+        # 普通MP4：编码结束后将moov移到文件开头（需重写整个文件）
+        return ["-movflags", "+faststart", "-write_tmcd", "0"]
+        
+    def _check_gpu_resolution_support(self, width, height, gpu_type):
+        """检测GPU是否支持指定分辨率"""
+        return check_gpu_resolution_support(width, height, gpu_type)
         
     def convert_video(self, input_path, output_path, target_width, target_height, 
-                     use_gpu=True, message_queue=None):
-        """转换视频 - 支持GPU失败时自动回退到CPU"""
+                     use_gpu=True, message_queue=None, faststart_no_rewrite=True, video_info=None):
+        """转换视频 - 支持GPU失败时自动回退到CPU
+        
+        video_info为调用方已获取的视频信息，提供时不再重复调用ffprobe。
+        faststart_no_rewrite为True时MP4/MOV输出使用分片格式，编码结束后无需重写整个文件；
+        需要兼容旧播放器的非分片文件时设为False。
+        """
         # 首先尝试GPU编码（如果启用）
         if use_gpu:
-            success = self._execute_ffmpeg(input_path, output_path, target_width, target_height, True, message_queue)
-            if success:
-                return True
+            output_ext = os.path.splitext(output_path)[1].lower()
+            encoder = self._select_encoder(target_width, target_height, True, output_ext, message_queue)
+            success = self._execute_ffmpeg(input_path, output_path, target_width, target_height, True, message_queue,
+                                           faststart_no_rewrite, video_info, encoder)
+            if success or self.should_stop:
+                return success
+                
+            # HEVC/AV1编码失败（如旧GPU不支持）时先用同一GPU的H.264编码器重试
+            fallback = self._h264_fallback_encoder(encoder, target_width, target_height)
+            if fallback:
+                if message_queue:
+                    message_queue.put(("log", f"HEVC/AV1编码失败，改用 {fallback} 重试..."))
+                success = self._execute_ffmpeg(input_path, output_path, target_width, target_height, True,
+                                               message_queue, faststart_no_rewrite, video_info, fallback)
+                if success or self.should_stop:
+                    return success
             
             # GPU失败，回退到CPU
             if message_queue:
                 message_queue.put(("log", "GPU编码失败，自动切换到CPU编码..."))
         
-        # 使用CPU编码
-        return self._execute_ffmpeg(input_path, output_path, target_width, target_height, False, message_queue)
+        # 使用CPU编码：高分辨率长视频分段并行编码
+        video_info = video_info or self.get_video_info(input_path)
+        duration = video_info.get('duration', 0) if video_info else 0
+        n_shards = min(SEGMENT_MAX_SHARDS, (os.cpu_count() or 1) // SEGMENT_THREADS)
+        if target_width >= HIGH_RES_WIDTH and duration >= SEGMENT_MIN_DURATION and n_shards > 1:
+            success = self._segment_encode(input_path, output_path, target_width, target_height, n_shards,
+                                           message_queue, faststart_no_rewrite, video_info)
+            if success or self.should_stop:
+                return success
+            if message_queue:
+                message_queue.put(("log", "分段编码失败，改为整体编码..."))
+                
+        return self._execute_ffmpeg(input_path, output_path, target_width, target_height, False, message_queue,
+                                    faststart_no_rewrite, video_info)
     
-    def _execute_ffmpeg(self, input_path, output_path, target_width, target_height, use_gpu, message_queue):
-        """执行FFmpeg转换"""
+    def _h264_fallback_encoder(self, encoder, target_width, target_height):
+        """返回与HEVC/AV1编码器同一GPU且支持目标分辨率的H.264编码器，没有时返回None"""
+        for gpu_type, h264_encoder, _ in _GPU_ENCODERS:
+            codec_encoders = [_HEVC_ENCODERS[gpu_type][1]]
+            if gpu_type in _AV1_ENCODERS:
+                codec_encoders.append(_AV1_ENCODERS[gpu_type][1])
+            if encoder in codec_encoders:
+                supported, _ = self._check_gpu_resolution_support(target_width, target_height, gpu_type)
+                return h264_encoder if supported else None
+        return None
+        
+    def default_max_workers(self, use_gpu=True):
+        """并行转换的默认任务数：按CPU核心数估算，使用NVENC时不超过驱动的会话数限制"""
+        max_workers = min(3, max(1, (os.cpu_count() or 1) // 4))
+        if use_gpu and "nvenc" in self.detect_gpu():
+            max_workers = min(max_workers, NVENC_MAX_SESSIONS)
+        return max_workers
+        
+    def convert_many(self, jobs, use_gpu=True, max_workers=None, on_done=None):
+        """并行转换多个视频
+        
+        jobs为字典列表或逐个产生任务的可迭代对象（任务产生后立即开始），包含 input、output、
+        width、height，可选 message_queue、video_info。包含batch（子任务列表）的任务交给
+        convert_batch合并转换，其结果为子任务结果列表。on_done(job, result)在每个任务结束后
+        于工作线程中调用。返回与jobs顺序一致的结果列表。
+        """
+        # 每个任务各自启动FFmpeg进程，线程池即可
+        if max_workers is None:
+            max_workers = self.default_max_workers(use_gpu)
+            
+        def run_job(job):
+            result = [False] * len(job['batch']) if 'batch' in job else False
+            try:
+                if self.should_stop:
+                    pass
+                elif 'batch' in job:
+                    result = self.convert_batch(job['batch'], job['width'], job['height'],
+                                                use_gpu, job.get('message_queue'))
+                else:
+                    result = self.convert_video(job['input'], job['output'], job['width'], job['height'],
+                                                use_gpu, job.get('message_queue'),
+                                                video_info=job.get('video_info'))
+            finally:
+                if on_done:
+                    on_done(job, result)
+            return result
+            
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run_job, jobs))
+            
+    def batch_key(self, video_info, output_path, target_width, target_height):
+        """返回可合并转换的分组键，键相同的任务可交给convert_batch；不适合合并时返回None
+        
+        concat分离器沿用第一个文件的解码器和流参数，音频直接复制，因此要求视频编码、档次、
+        像素格式、分辨率、帧率以及各音频流的编码、采样率、声道完全相同。临时输出与最终文件
+        需位于同一目录才能直接移动，因此输出目录也须相同。
+        """
+        # 旧版本缓存的视频信息缺少像素格式等字段，无法确认是否一致
+        if not video_info or not video_info.get('pix_fmt'):
+            return None
+        if not 0 < video_info.get('duration', 0) <= BATCH_MAX_DURATION:
+            return None
+        if video_info.get('subtitle_codecs'):
+            return None
+        return (
+            target_width, target_height,
+            os.path.dirname(os.path.abspath(output_path)),
+            os.path.splitext(output_path)[1].lower(),
+            video_info.get('codec'), video_info.get('profile'), video_info['pix_fmt'],
+            video_info.get('width'), video_info.get('height'), video_info.get('fps'),
+            tuple(video_info.get('audio_codecs', [])),
+            tuple(tuple(audio_format) for audio_format in video_info.get('audio_formats', [])),
+        )
+        
+    def convert_batch(self, jobs, target_width, target_height, use_gpu=True, message_queue=None,
+                      faststart_no_rewrite=True):
+        """用一个FFmpeg进程连续转换多个参数相同的短视频，编码器只初始化一次
+        
+        jobs为字典列表，包含 input、output，可选 video_info、message_queue。各任务的batch_key
+        不一致、编码器无法强制IDR帧或合并转换失败时逐个调用convert_video。
+        返回与jobs顺序一致的结果列表。
+        """
+        if not jobs:
+            return []
+            
+        def convert_each():
+            # 各文件用自己的消息队列汇报进度，清零合并转换已汇报的进度
+            if message_queue:
+                message_queue.put(("progress_percent", 0))
+            return [not self.should_stop and
+                    self.convert_video(job['input'], job['output'], target_width, target_height,
+                                       use_gpu, job.get('message_queue') or message_queue,
+                                       faststart_no_rewrite, job.get('video_info'))
+                    for job in jobs]
+                    
+        infos = [job.get('video_info') or self.get_video_info(job['input']) for job in jobs]
+        keys = {self.batch_key(info, job['output'], target_width, target_height)
+                for job, info in zip(jobs, infos)}
+        if len(jobs) < 2 or None in keys or len(keys) > 1:
+            return convert_each()
+            
+        output_ext = os.path.splitext(jobs[0]['output'])[1].lower()
+        encoder = self._select_encoder(target_width, target_height, use_gpu, output_ext, message_queue)
+        if encoder not in _FORCED_IDR_ARGS:
+            return convert_each()
+            
+        temp_dir = None
         try:
-            self.should_stop = False
+            temp_dir = tempfile.mkdtemp(prefix=".vfhm_batch_",
+                                        dir=os.path.dirname(os.path.abspath(jobs[0]['output'])))
+            durations = [info['duration'] for info in infos]
+            list_path = os.path.join(temp_dir, "list.txt")
+            self._write_concat_list(list_path, [job['input'] for job in jobs], durations)
             
-            # 首先获取视频时长用于计算进度
-            video_info = self.get_video_info(input_path)
-            total_duration = video_info.get('duration', 0) if video_info else 0
+            # 在每个文件的起点强制IDR帧并切分输出，每个输入对应一个输出文件
+            boundaries = []
+            elapsed = 0.0
+            for duration in durations[:-1]:
+                elapsed += duration
+                boundaries.append(f"{elapsed:.6f}")
+            boundaries = ",".join(boundaries)
+            fps = infos[0].get('fps') or 30.0
             
-            # 构建FFmpeg命令
-            cmd = [self.ffmpeg_path]
+            output_args = ["-force_key_frames", boundaries]
+            output_args.extend(_FORCED_IDR_ARGS[encoder])
+            output_args.extend([
+                "-f", "segment", "-segment_times", boundaries,
+                "-segment_time_delta", f"{0.5 / fps:.6f}",  # 容许强制关键帧时间的舍入误差（半帧）
+                "-reset_timestamps", "1"
+            ])
+            mux_args = self._build_mux_args(jobs[0]['output'], faststart_no_rewrite)
+            if mux_args:
+                output_args.extend(["-segment_format_options", f"movflags={mux_args[1]}"])
+            output_pattern = os.path.join(temp_dir, f"out_%04d{output_ext}")
+            output_args.extend(["-y", output_pattern])
             
-            # 通用参数
-            cmd.extend(["-hide_banner", "-loglevel", "error", "-stats"])
+            if message_queue:
+                message_queue.put(("log", f"批量转换: {len(jobs)} 个文件使用同一个FFmpeg进程"))
+            cmd = self._build_ffmpeg_cmd(list_path, jobs[0]['output'], target_width, target_height, use_gpu,
+                                         message_queue, infos[0], output_args,
+                                         input_args=("-f", "concat", "-safe", "0"), encoder=encoder)
+            success = self._run_ffmpeg(cmd, message_queue, sum(durations),
+                                       high_priority=encoder != "libx264")
             
-            # 输入文件
-            cmd.extend(["-i", input_path])
+            # 切分点未落在文件边界时各段时长与对应输入不符，此时放弃合并结果
+            segments = [output_pattern % i for i in range(len(jobs))]
+            if success and all(os.path.exists(path) for path in segments) \
+                    and not os.path.exists(output_pattern % len(jobs)):
+                tolerance = 1.0 / fps + 0.05  # 一帧以内（音频包边界与时间戳舍入）
+                segment_infos = [self._probe_video_info(path) for path in segments]
+                if all(segment_info and abs(segment_info['duration'] - duration) <= tolerance
+                       for segment_info, duration in zip(segment_infos, durations)):
+                    for job, path in zip(jobs, segments):
+                        os.replace(path, job['output'])
+                    return [True] * len(jobs)
+                if message_queue:
+                    message_queue.put(("log", "批量转换的分段时长与源文件不一致"))
+                    
+        except Exception as e:
+            if message_queue:
+                message_queue.put(("log", f"批量转换出错: {str(e)}"))
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
             
-            # 编码器设置
-            if use_gpu:
-                gpu_options = self.detect_gpu()
-                # 根据分辨率选择合适的GPU编码参数
-                is_high_res = target_width >= 5120  # 5K及以上分辨率
-                gpu_used = False
-                
-                # 尝试NVIDIA NVENC
-                if "nvenc" in gpu_options:
-                    supported, msg = self._check_gpu_resolution_support(target_width, target_height, "nvenc")
-                    if supported:
-                        # 使用经过测试的最稳定参数
-                        cmd.extend([
-                            "-c:v", "h264_nvenc",
-                            "-preset", "fast",      # fast预设最稳定
-                            "-b:v", "5M"           # 简单的码率控制
-                        ])
-                        gpu_used = True
-                        if message_queue:
-                            message_queue.put(("log", "GPU加速: 使用 NVIDIA NVENC"))
-                    else:
-                        if message_queue:
-                            message_queue.put(("log", f"NVENC限制: {msg}"))
+        if self.should_stop:
+            return [False] * len(jobs)
+        if message_queue:
+            message_queue.put(("log", "批量转换失败，改为逐个转换..."))
+        return convert_each()
+        
+    def _probe_keyframes(self, video_path):
+        """获取主视频流关键帧时间（秒，相对文件起始时间），只读取数据包不解码"""
+        try:
+            cmd = [
+                self.ffprobe_path,
+                "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "packet=pts_time,flags:format=start_time",
+                "-of", "csv",
+                video_path
+            ]
+            result = subprocess.run(cmd, capture_output=True,
+                                  creationflags=subprocess.CREATE_NO_WINDOW)
+            if result.returncode != 0:
+                return []
                 
-                # 如果NVENC不可用，尝试AMD AMF
-                if not gpu_used and "amf" in gpu_options:
-                    supported, msg = self._check_gpu_resolution_support(target_width, target_height, "amf")
-                    if supported:
-                        if is_high_res:
-                            cmd.extend([
-                                "-c:v", "h264_amf",
-                                "-quality", "balanced",  # 使用balanced而不是quality
-                                "-rc", "vbr",
-                                "-b:v", "12M",  # 降低码率
-                                "-maxrate", "18M",
-                                "-usage", "transcoding"  # 转码模式
-                            ])
-                        else:
-                            cmd.extend([
-                                "-c:v", "h264_amf",
-                                "-quality", "quality",
-                                "-rc", "vbr",
-                                "-b:v", "8M"
-                            ])
-                        gpu_used = True
-                        if message_queue:
-                            message_queue.put(("log", "GPU加速: 使用 AMD AMF"))
-                    else:
-                        if message_queue:
-                            message_queue.put(("log", f"AMD AMF限制: {msg}"))
+            # 输出行形如 packet,12.345000,K__ 与 format,0.000000
+            start_time = 0.0
+            keyframes = []
+            for line in result.stdout.splitlines():
+                fields = line.strip().split(b',')
+                try:
+                    if fields[0] == b'packet' and len(fields) >= 3 and b'K' in fields[2]:
+                        keyframes.append(float(fields[1]))
+                    elif fields[0] == b'format' and len(fields) >= 2:
+                        start_time = float(fields[1])
+                except ValueError:
+                    continue  # 时间为N/A
+                    
+            return sorted(t - start_time for t in keyframes)
+            
+        except Exception as e:
+            print(f"获取关键帧出错: {e}")
+            return []
+            
+    def _write_concat_list(self, list_path, paths, durations=None):
+        """写入concat分离器使用的文件列表，提供durations时写明各文件时长"""
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for i, path in enumerate(paths):
+                escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if durations:
+                    f.write(f"duration {durations[i]:.6f}\n")
                 
-                # 如果前面都不可用，尝试Intel QuickSync
-                if not gpu_used and "qsv" in gpu_options:
-                    supported, msg = self._check_gpu_resolution_support(target_width, target_height, "qsv")
-                    if supported:
-                        if is_high_res:
-                            cmd.extend([
-                                "-c:v", "h264_qsv",
-                                "-preset", "medium",  # 使用medium而不是slower
-                                "-profile:v", "main", # 使用main而不是high
-                                "-b:v", "12M",       # 降低码率
-                                "-maxrate", "18M",
-                                "-bufsize", "24M"
-                            ])
-                        else:
-                            cmd.extend([
-                                "-c:v", "h264_qsv",
-                                "-preset", "medium",
-                                "-b:v", "8M"
-                            ])
-                        gpu_used = True
-                        if message_queue:
-                            message_queue.put(("log", "GPU加速: 使用 Intel QuickSync"))
-                    else:
-                        if message_queue:
-                            message_queue.put(("log", f"Intel QSV限制: {msg}"))
+    def _segment_encode(self, input_path, output_path, target_width, target_height, n_shards,
+                        message_queue=None, faststart_no_rewrite=True, video_info=None):
+        """按关键帧将视频切分为n_shards段并行CPU编码，再无损拼接并复制原文件的音频"""
+        video_info = video_info or self.get_video_info(input_path)
+        total_duration = video_info.get('duration', 0) if video_info else 0
+        keyframes = self._probe_keyframes(input_path)
+        
+        # 在均分点之后最近的关键帧处切分，保证每段从关键帧开始
+        cuts = [0.0]
+        for i in range(1, n_shards):
+            pos = bisect.bisect_left(keyframes, total_duration * i / n_shards)
+            if pos < len(keyframes) and keyframes[pos] > cuts[-1]:
+                cuts.append(keyframes[pos])
+        if len(cuts) < 2:
+            return False
+            
+        if message_queue:
+            message_queue.put(("log", f"高分辨率长视频: 分为 {len(cuts)} 段并行编码"))
+            
+        temp_dir = None
+        try:
+            # 临时分段文件放在输出目录，避免系统盘空间不足
+            temp_dir = tempfile.mkdtemp(prefix=".vfhm_segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+            threads = str(max(1, (os.cpu_count() or 1) // len(cuts)))
+            video_filter = self._software_scale_filter(target_width, target_height)
+            segments = []
+            commands = []
+            for i, start in enumerate(cuts):
+                segment_path = os.path.join(temp_dir, f"seg{i}.mkv")
+                segments.append(segment_path)
+                cmd = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostats",
+                       "-ss", f"{start:.6f}"]
+                if i + 1 < len(cuts):
+                    cmd.extend(["-t", f"{cuts[i + 1] - start:.6f}"])
+                cmd.extend(["-thread_queue_size", "4096", "-i", input_path,
+                            "-threads", threads, "-filter_threads", threads])
+                cmd.extend(self._encoder_args("libx264", True))
+                cmd.extend(_HIGH_RES_ARGS)
+                cmd.extend(["-vf", video_filter, "-map", "0:v:0", "-an", "-sn", "-y", segment_path])
+                commands.append(cmd)
                 
-                # 如果所有GPU都不可用，使用CPU
-                if not gpu_used:
+            # 各段同时编码，按完成数量汇报进度
+            shard_processes = []
+            with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+                futures = [executor.submit(self._run_ffmpeg, cmd, message_queue, 0, False,
+                                           shard_processes.append)
+                           for cmd in commands]
+                done = 0
+                for future in as_completed(futures):
+                    if not future.result():
+                        # 一段失败即结束其余分段，不必等它们编码完成
+                        for process in shard_processes:
+                            try:
+                                process.kill()
+                            except Exception:
+                                pass
+                        return False
+                    done += 1
                     if message_queue:
-                        message_queue.put(("log", "GPU不支持当前分辨率，使用CPU编码"))
-                    # 根据分辨率选择CPU参数
-                    if is_high_res:
-                        cmd.extend([
-                            "-c:v", "libx264",
-                            "-preset", "ultrafast",  # 使用最快速度
-                            "-crf", "28"            # 降低质量，提高速度
-                        ])
-                    else:
-                        cmd.extend([
-                            "-c:v", "libx264",
-                            "-preset", "fast",
-                            "-crf", "26"
-                        ])
-            else:
-                # CPU编码
-                is_high_res = target_width >= 5120
-                if message_queue:
-                    message_queue.put(("log", "GPU加速已禁用，使用CPU编码"))
-                if is_high_res:
-                    cmd.extend([
-                        "-c:v", "libx264",
-                        "-preset", "ultrafast",  # 使用最快速度
-                        "-crf", "28"            # 降低质量，提高速度
-                    ])
-                else:
-                    cmd.extend([
-                        "-c:v", "libx264",
-                        "-preset", "fast",
-                        "-crf", "26"
-                    ])
-            
-            # 添加分辨率和性能优化参数（对所有编码器）
-            is_high_res = target_width >= 5120
-            if is_high_res:
-                # 高分辨率优化
-                cmd.extend([
-                    "-threads", "0",  # 使用所有可用线程
-                    "-thread_type", "frame",  # 帧级多线程
-                ])
-                if message_queue:
-                    message_queue.put(("log", f"检测到高分辨率 ({target_width}x{target_height})，使用优化的编码参数"))
+                        message_queue.put(("log", f"分段编码进度: {done}/{len(commands)}"))
+                        message_queue.put(("progress_percent", done * 100 / len(commands)))
+                        
+            # 拼接分段视频（-c:v copy），音频/字幕从原文件复制
+            list_path = os.path.join(temp_dir, "list.txt")
+            self._write_concat_list(list_path, segments)
             
-            # 视频滤镜：调整分辨率（对所有编码器）
-            cmd.extend([
-                "-vf", f"scale={target_width}:{target_height}:flags=lanczos",  # 使用高质量缩放算法
-                "-c:a", "copy",  # 音频流复制
-                "-movflags", "+faststart",  # 优化文件结构
+            cmd = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostats",
+                   "-f", "concat", "-safe", "0", "-i", list_path,
+                   "-i", input_path,
+                   "-c:v", "copy"]
+            cmd.extend(self._build_stream_args(video_info, output_path, message_queue, source_input=1))
+            cmd.extend(self._build_mux_args(output_path, faststart_no_rewrite))
+            cmd.extend(["-y", output_path])
+            return self._run_ffmpeg(cmd, message_queue, total_duration, False)
+            
+        except Exception as e:
+            if message_queue:
+                message_queue.put(("log", f"分段编码出错: {str(e)}"))
+            return False
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            
+    def _execute_ffmpeg(self, input_path, output_path, target_width, target_height, use_gpu, message_queue,
+                        faststart_no_rewrite=True, video_info=None, encoder=None):
+        """执行FFmpeg转换，encoder为调用方已选定的编码器，未提供时自动选择"""
+        try:
+            # 获取视频时长用于计算进度（调用方未提供视频信息时才探测）
+            video_info = video_info or self.get_video_info(input_path)
+            total_duration = video_info.get('duration', 0) if video_info else 0
+            
+            output_args = self._build_mux_args(output_path, faststart_no_rewrite)
+            output_args.extend([
                 "-y",  # 覆盖输出文件
                 output_path
             ])
+            if encoder is None:
+                output_ext = os.path.splitext(output_path)[1].lower()
+                encoder = self._select_encoder(target_width, target_height, use_gpu, output_ext, message_queue)
+            cmd = self._build_ffmpeg_cmd(input_path, output_path, target_width, target_height, use_gpu,
+                                         message_queue, video_info, output_args, encoder=encoder)
+            return self._run_ffmpeg(cmd, message_queue, total_duration,
+                                    high_priority=encoder != "libx264")
+                
+        except Exception as e:
+            if message_queue:
+                message_queue.put(("log", f"转换出错: {str(e)}"))
+            return False
             
+    def _select_encoder(self, target_width, target_height, use_gpu, output_ext, message_queue=None):
+        """选择视频编码器，GPU不可用或禁用时返回libx264"""
+        if not use_gpu:
             if message_queue:
-                cmd_str = " ".join([f'"{arg}"' if " " in arg else arg for arg in cmd])
-                message_queue.put(("log", f"执行命令: {cmd_str}"))
-                # 添加GPU使用情况的日志
-                if use_gpu:
-                    if "nvenc" in cmd_str:
-                        message_queue.put(("log", "✓ 使用NVIDIA GPU加速 (NVENC)"))
-                    elif "amf" in cmd_str:
-                        message_queue.put(("log", "✓ 使用AMD GPU加速 (AMF)"))
-                    elif "qsv" in cmd_str:
-                        message_queue.put(("log", "✓ 使用Intel GPU加速 (QuickSync)"))
-                    elif "libx264" in cmd_str:
-                        message_queue.put(("log", "⚠ GPU不可用，回退到CPU编码 (libx264)"))
-                else:
-                    message_queue.put(("log", "使用CPU编码 (libx264)"))
-                
-            # 创建进程
+                message_queue.put(("log", "GPU加速已禁用，使用CPU编码"))
+            return "libx264"
+        encoder = self._pick_encoder(target_width, target_height, self.detect_gpu(), message_queue,
+                                     allow_hevc=output_ext in HEVC_CONTAINERS,
+                                     allow_av1=output_ext in AV1_CONTAINERS)
+        if encoder == "libx264" and message_queue:
+            message_queue.put(("log", "GPU不支持当前分辨率，使用CPU编码"))
+        return encoder
+        
+    def _build_ffmpeg_cmd(self, input_path, output_path, target_width, target_height, use_gpu, message_queue,
+                          video_info, output_args, input_args=(), encoder=None):
+        """构建缩放转换的FFmpeg命令
+        
+        output_path用于确定容器相关参数，output_args为命令末尾的封装参数与输出文件，
+        input_args为 -i 之前的输入格式参数（如concat），encoder为调用方已选定的编码器。
+        """
+        # 构建FFmpeg命令
+        cmd = [self.ffmpeg_path]
+        
+        # 通用参数
+        cmd.extend(["-hide_banner", "-loglevel", "error", "-nostats"])
+        
+        # 结构化进度输出到stdout (key=value)
+        cmd.extend(["-progress", "pipe:1"])
+        
+        # 输入文件（加大输入线程队列，避免解复用阻塞）
+        cmd.extend(["-thread_queue_size", "4096", *input_args, "-i", input_path])
+        
+        # 线程参数：编码器自动线程数，滤镜使用全部CPU核心
+        cpu_count = str(os.cpu_count() or 1)
+        cmd.extend([
+            "-threads", "0",
+            "-filter_threads", cpu_count,
+            "-filter_complex_threads", cpu_count
+        ])
+        
+        # 硬件解码参数（需放在 -i 之前）与视频滤镜，默认CPU缩放
+        hwaccel_args = []
+        video_filter = self._software_scale_filter(target_width, target_height)
+        
+        # 根据分辨率选择编码参数
+        is_high_res = target_width >= HIGH_RES_WIDTH
+        
+        # 选择编码器
+        gpu_options = self.detect_gpu() if use_gpu else []
+        output_ext = os.path.splitext(output_path)[1].lower()
+        if encoder is None:
+            encoder = self._select_encoder(target_width, target_height, use_gpu, output_ext, message_queue)
+        cmd.extend(self._encoder_args(encoder, is_high_res))
+        if encoder.startswith("hevc") and output_ext in _HVC1_CONTAINERS:
+            cmd.extend(["-tag:v", "hvc1"])
+        
+        # 硬件解码与缩放
+        if encoder.endswith("_nvenc"):
+            # NVDEC解码 -> CUDA缩放 -> NVENC编码，帧全程不离开显存
+            hwaccel_args, cuda_filter, pipeline = self._build_cuda_pipeline(
+                video_info, target_width, target_height)
+            if cuda_filter:
+                video_filter = cuda_filter
+            if pipeline and message_queue:
+                message_queue.put(("log", f"GPU流水线: {pipeline}"))
+        elif encoder.endswith("_qsv") and "scale_qsv" in self._get_ffmpeg_filters():
+            # QSV在显存中缩放；H.264/HEVC编码器只接受8位输入，10位源统一输出nv12
+            decoder = QSV_DECODERS.get(video_info.get('codec') if video_info else None)
+            if decoder in self._get_ffmpeg_decoders():
+                hwaccel_args = ["-hwaccel", "qsv", "-hwaccel_output_format", "qsv", "-c:v", decoder]
+                video_filter = f"scale_qsv=w={target_width}:h={target_height}:format=nv12"
+            else:
+                # 无对应QSV解码器：CPU解码后上传到显存缩放
+                hwaccel_args = ["-init_hw_device", "qsv=hw", "-filter_hw_device", "hw"]
+                video_filter = (f"format=nv12,hwupload=extra_hw_frames=64,"
+                                f"scale_qsv=w={target_width}:h={target_height}:format=nv12")
+        elif "nvenc" in gpu_options:
+            # 有NVIDIA GPU但未使用NVENC（如分辨率超限）时，仍在GPU上完成缩放
+            cuda_filter = self._build_cuda_scale_filter(target_width, target_height)
+            if cuda_filter:
+                video_filter = cuda_filter
+                if message_queue:
+                    message_queue.put(("log", "GPU缩放: 上传到CUDA缩放后交给编码器"))
+        
+        # 添加分辨率和性能优化参数（对所有编码器）
+        if is_high_res:
+            # 高分辨率优化
+            cmd.extend(_HIGH_RES_ARGS)
+            if message_queue:
+                message_queue.put(("log", f"检测到高分辨率 ({target_width}x{target_height})，使用优化的编码参数"))
+        
+        # 硬件解码参数插入到输入文件之前
+        if hwaccel_args:
+            input_pos = cmd.index("-i")
+            cmd[input_pos:input_pos] = hwaccel_args
+        
+        # 视频滤镜：调整分辨率（对所有编码器）
+        cmd.extend([
+            "-vf", video_filter,
+        ])
+        # 音频/字幕流复制
+        cmd.extend(self._build_stream_args(video_info, output_path, message_queue))
+        cmd.extend(output_args)
+        
+        if message_queue:
+            cmd_str = " ".join([f'"{arg}"' if " " in arg else arg for arg in cmd])
+            message_queue.put(("log", f"执行命令: {cmd_str}"))
+            # 添加GPU使用情况的日志
+            if use_gpu:
+                if "nvenc" in cmd_str:
+                    message_queue.put(("log", "✓ 使用NVIDIA GPU加速 (NVENC)"))
+                elif "amf" in cmd_str:
+                    message_queue.put(("log", "✓ 使用AMD GPU加速 (AMF)"))
+                elif "qsv" in cmd_str:
+                    message_queue.put(("log", "✓ 使用Intel GPU加速 (QuickSync)"))
+                elif "libx264" in cmd_str:
+                    message_queue.put(("log", "⚠ GPU不可用，回退到CPU编码 (libx264)"))
+            else:
+                message_queue.put(("log", "使用CPU编码 (libx264)"))
+            
+        return cmd
+            
+    def _run_ffmpeg(self, cmd, message_queue=None, total_duration=0, report_progress=True, on_start=None,
+                    high_priority=False):
+        """运行FFmpeg命令并监控输出，成功返回True
+        
+        report_progress为False时不发送进度消息（如分段编码由调用方汇总进度）；
+        on_start在进程启动后以进程对象调用（如分段编码记录同组进程以便一起结束）；
+        high_priority为True时提高进程优先级，仅用于硬件编码。
+        """
+        process = None
+        try:
+            # 创建进程：隐藏窗口，管道以字节方式读取避免文本解码开销
             startupinfo = subprocess.STARTUPINFO()
             startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
             startupinfo.wShowWindow = subprocess.SW_HIDE
             
-            self.current_process = subprocess.Popen(
+            # 硬件编码时提高优先级，及时向GPU提交帧；CPU编码占满全部核心，
+            # 保持普通优先级，避免界面和系统失去响应
+            creationflags = subprocess.CREATE_NO_WINDOW
+            if high_priority:
+                creationflags |= subprocess.HIGH_PRIORITY_CLASS
+                
+            process = subprocess.Popen(
                 cmd,
+                stdin=subprocess.PIPE,  # 停止时通过stdin发送q
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
+                bufsize=1 << 20,  # 1MB读缓冲
                 startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                creationflags=creationflags
             )
             
-            # 监控进程输出
-            while True:
+            with self._processes_lock:
+                self._processes.add(process)
+            if on_start:
+                on_start(process)
+                
+            # 进程启动前已请求停止，stop_conversion未能结束它
+            if self.should_stop:
+                process.kill()
+            
+            # stdout(进度)和stderr(错误)各由一个后台线程读取，避免任一管道写满阻塞FFmpeg。
+            # Windows的selectors不支持管道，因此不用select轮询；停止时由stop_conversion结束进程，
+            # 管道关闭后读取线程退出，停止延迟与FFmpeg的输出频率无关
+            output_queue = queue.Queue()
+            readers = [
+                threading.Thread(target=self._pump_pipe,
+                                 args=(process.stdout, "stdout", output_queue),
+                                 daemon=True),
+                threading.Thread(target=self._pump_pipe,
+                                 args=(process.stderr, "stderr", output_queue),
+                                 daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+                
+            # 监控进度输出：key=value 行，每组以 progress=continue/end 结束
+            progress = {}
+            parse_progress = bool(message_queue) and report_progress
+            open_pipes = len(readers)
+            while open_pipes:
+                source, raw_line = output_queue.get()
+                if raw_line is None:
+                    open_pipes -= 1
+                    continue
                 if self.should_stop:
-                    self.current_process.terminate()
-                    return False
+                    # 由stop_conversion负责结束进程，这里只等待输出结束
+                    continue
                     
-                # 同时读取stderr和stdout
-                output = None
-                if self.current_process.stderr is not None:
-                    output = self.current_process.stderr.readline()
-                if not output and self.current_process.stdout is not None:
-                    output = self.current_process.stdout.readline()
+                if source == "stderr":
+                    error_line = raw_line.decode('utf-8', 'replace').strip()
+                    if error_line and message_queue:
+                        message_queue.put(("log", f"FFmpeg: {error_line}"))
+                    continue
                     
-                if output == '' and self.current_process.poll() is not None:
-                    break
+                # 不汇报进度时stdout只需读空，不做任何解析
+                if not parse_progress:
+                    continue
+                    
+                # 按字节拆分（行首无空白，无需整行strip），只处理用到的字段值
+                key, _, value = raw_line.partition(b'=')
+                if key in _PROGRESS_KEYS:
+                    progress[key.decode('ascii')] = value.strip().decode('ascii', 'replace')
+                    continue
+                if key != b'progress':
+                    continue
                     
-                if output and message_queue:
-                    output_line = output.strip()
-                    # 解析FFmpeg输出中的进度信息
-                    if "time=" in output_line:
-                        progress_info, progress_percent = self._parse_progress(output_line, total_duration)
-                        if progress_info:
-                            message_queue.put(("log", f"转换进度: {progress_info}"))
-                        # 发送进度百分比
-                        if progress_percent > 0:
-                            message_queue.put(("progress_percent", progress_percent))
-                    elif "frame=" in output_line:
-                        # 处理帧数信息
-                        progress_info, progress_percent = self._parse_progress(output_line, total_duration)
-                        if progress_info:
-                            message_queue.put(("log", f"转换进度: {progress_info}"))
-                        # 即使没有时间信息，也可以通过帧数估算进度
-                        if progress_percent > 0:
-                            message_queue.put(("progress_percent", progress_percent))
-                    elif "error" in output_line.lower() or "failed" in output_line.lower():
-                        message_queue.put(("log", f"FFmpeg: {output_line}"))
-                    # 在调试模式下显示所有输出
-                    elif output_line and ("fps=" in output_line or "bitrate=" in output_line):
-                        # 这是FFmpeg的统计信息行，包含进度信息
-                        progress_info, progress_percent = self._parse_progress(output_line, total_duration)
-                        if progress_percent > 0:
-                            message_queue.put(("progress_percent", progress_percent))
+                progress_info, progress_percent = self._parse_progress(progress, total_duration)
+                if progress_info:
+                    message_queue.put(("log", f"转换进度: {progress_info}"))
+                if progress_percent > 0:
+                    message_queue.put(("progress_percent", progress_percent))
                         
+            process.wait()
+            if self.should_stop:
+                return False
+                
             # 检查返回码
-            return_code = self.current_process.poll()
+            return_code = process.poll()
             if return_code == 0:
                 return True
             else:
@@ -426,16 +1299,25 @@ class VideoProcessor:
                 message_queue.put(("log", f"转换出错: {str(e)}"))
             return False
         finally:
-            self.current_process = None
+            if process:
+                with self._processes_lock:
+                    self._processes.discard(process)
             
-    def _parse_progress(self, output, total_duration=0):
-        """解析FFmpeg进度输出"""
+    def _pump_pipe(self, pipe, source, output_queue):
+        """读取管道的每一行放入队列，结束时放入None"""
         try:
-            # 处理progress格式的输出 (out_time_ms=xxxxx)
-            time_ms_match = re.search(r'out_time_ms=(\d+)', output)
-            if time_ms_match:
-                current_ms = int(time_ms_match.group(1))
-                current_seconds = current_ms / 1000000  # 微秒转秒
+            for raw_line in iter(pipe.readline, b''):
+                output_queue.put((source, raw_line))
+        finally:
+            output_queue.put((source, None))
+                
+    def _parse_progress(self, progress, total_duration=0):
+        """解析一组FFmpeg -progress 输出，返回 (进度描述, 百分比)"""
+        try:
+            # out_time_us为微秒；开始阶段可能为N/A
+            out_time_us = progress.get('out_time_us', '')
+            if out_time_us.isdigit():
+                current_seconds = int(out_time_us) / 1000000  # 微秒转秒
                 
                 # 计算百分比
                 progress_percent = 0
@@ -446,28 +1328,22 @@ class VideoProcessor:
                 minutes = int((current_seconds % 3600) // 60)
                 seconds = current_seconds % 60
                 
-                return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}", progress_percent
-            
-            # 处理传统格式的时间输出 (time=xx:xx:xx.xx)
-            time_match = re.search(r'time=(\d+):(\d+):(\d+\.\d+)', output)
-            if time_match:
-                hours = int(time_match.group(1))
-                minutes = int(time_match.group(2))
-                seconds = float(time_match.group(3))
-                current_seconds = hours * 3600 + minutes * 60 + seconds
-                
-                # 计算百分比
-                progress_percent = 0
-                if total_duration > 0:
-                    progress_percent = min((current_seconds / total_duration) * 100, 100)
+                info = f"{hours:02d}:{minutes:02d}:{seconds:06.3f}"
                 
-                return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}", progress_percent
+                # 附加帧率与码率（开始阶段可能为N/A）
+                fps = progress.get('fps', '')
+                bitrate = progress.get('bitrate', '')
+                if fps and fps != 'N/A' and fps != '0.00':
+                    info += f" | {fps} fps"
+                if bitrate and bitrate != 'N/A':
+                    info += f" | {bitrate}"
+                    
+                return info, progress_percent
                 
-            # 查找帧数信息
-            frame_match = re.search(r'frame=\s*(\d+)', output)
-            if frame_match:
-                frame_count = int(frame_match.group(1))
-                return f"已处理 {frame_count} 帧", 0
+            # 没有时间信息时显示帧数
+            frame = progress.get('frame', '')
+            if frame.isdigit():
+                return f"已处理 {int(frame)} 帧", 0
                 
         except Exception as e:
             print(f"进度解析错误: {e}")
@@ -477,19 +1353,31 @@ class VideoProcessor:
     def stop_conversion(self):
         """停止转换"""
         self.should_stop = True
-        if self.current_process:
+        with self._processes_lock:
+            processes = list(self._processes)
+            
+        # 向所有FFmpeg发送q，让其正常结束编码会话并写完文件尾。
+        # 进程以CREATE_NO_WINDOW启动，不与本程序共享控制台，CTRL_BREAK_EVENT无法送达，
+        # 因此通过stdin通知而不是发送控制台信号
+        for process in processes:
             try:
-                self.current_process.terminate()
-                # 等待进程结束
-                for _ in range(10):  # 最多等待1秒
-                    if self.current_process.poll() is not None:
-                        break
-                    time.sleep(0.1)
+                process.stdin.write(b'q\n')
+                process.stdin.flush()
+            except Exception:
+                pass
                 
-                # 如果进程仍然存在，强制终止
-                if self.current_process.poll() is None:
-                    self.current_process.kill()
-            except:
+        # 由系统等待进程退出，进程结束即返回
+        for process in processes:
+            try:
+                process.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                # 未能在2秒内退出，强制终止并回收进程
+                try:
+                    process.kill()
+                    process.wait()
+                except Exception:
+                    pass
+            except Exception:
                 pass
                 
     def get_supported_formats(self):